@@ -1,4 +1,5 @@
 import pygame, sys, time
+from framepacer import FramePacer
 pygame.init()
 
 size = width, height = (640, 480)
@@ -67,14 +68,20 @@ def loop_naive():
         render()
 
 def loop_limited():
+    # sleeps (then spins) until the next frame is due, and just carries on if this one took too long
+    pacer = FramePacer(seconds_per_frame)
     while True:
         process_input()
-        start = time.time()
         update()
         render()
-        time.sleep(start + seconds_per_frame - time.time())
+        pacer.wait()
+
+def loop_fluid(max_fps = None):
+    # the update is scaled by however long the last frame took, capped at max_fps so it doesn't spin a whole core
+    render_pacer = None
+    if max_fps != None:
+        render_pacer = FramePacer(1 / max_fps)
 
-def loop_fluid():
     prev = time.time()
     while True:
         current = time.time()
@@ -84,27 +91,31 @@ def loop_fluid():
         render()
         prev = current
 
-def loop_separated(correction = False):
-    prev = time.time()
-    lag = 0.0
+        if render_pacer != None:
+            render_pacer.wait()
+
+def loop_separated(correction = False, max_fps = None):
+    # updates at a fixed rate, at most 5 at once so a long stall can't snowball
+    # rendering goes as fast as it can, unless it's capped at max_fps
+    pacer = FramePacer(seconds_per_frame)
+    render_pacer = None
+    if max_fps != None:
+        render_pacer = FramePacer(1 / max_fps)
 
     while(True):
-        current = time.time()
-        delta = current - prev
-        prev = current
-        lag += delta
-        
         process_input()
 
-        while(lag >= seconds_per_frame):
+        for i in range(pacer.ticks()):
             update()
-            lag -= seconds_per_frame
         
         if correction:
-            render(lag / seconds_per_frame)
+            render(pacer.lag())
         else:
             render()
 
+        if render_pacer != None:
+            render_pacer.wait()
+
 
 if __name__ == "__main__":
-    loop_separated(True)
\ No newline at end of file
+    loop_separated(True, 120)
\ No newline at end of file
@@ -15,20 +15,80 @@ class CustomEvent(IntEnum):
 class GameObject():
     def __init__(self, position = Vec2(0,0), bounds=Vec2(0,0), speed = Vec2(0,0), sprite = None):
         self.id = Game.next_id()
-        self.position = position
+        # copied so moving this object in place never moves another one sharing the same Vec2
+        self.position = position.copy()
         self.bounds = bounds
-        self.speed = speed
+        self.speed = speed.copy()
         self.sprite = sprite
         self.last_updated = 0
 
 class Layer():
-    def __init__(self, priority = 0, parallax = Vec2(1.0,1.0)):
+    # things which never move (tiles, scenery) are put in a grid of cell_size squares by position, so rendering only
+    # has to look at the cells around the camera instead of every object in the layer
+    # anything else is checked every frame, same as before
+    def __init__(self, priority = 0, parallax = Vec2(1.0,1.0), cell_size = 256):
         self.priority = priority
         self.parallax = parallax
-        self.objects = [] # store by index
-    
-    def add_object(self, obj):
-        self.objects.append(obj.id)
+        self.objects = {} # id -> object, in the order they're drawn
+        self.order = {} # id -> place in the draw order
+        self.next_order = 0
+        self.moving = {} # id -> object, anything not in the grid
+        self.cell_size = cell_size
+        self.cells = {} # (cell x, cell y) -> {id: object} for static objects
+        self.static_cells = {} # id -> cell, for removing static objects
+        self.max_bounds = [0, 0] # biggest static object, how far before its cell one can reach onto the screen
+
+    def add_object(self, obj, static = False):
+        # static objects have to stay where they were when they were added
+        self.objects[obj.id] = obj
+        self.order[obj.id] = self.next_order
+        self.next_order += 1
+        if not static:
+            self.moving[obj.id] = obj
+            return
+        cell = (math.floor(obj.position[0] / self.cell_size), math.floor(obj.position[1] / self.cell_size))
+        self.cells.setdefault(cell, {})[obj.id] = obj
+        self.static_cells[obj.id] = cell
+        self.max_bounds[0] = max(self.max_bounds[0], obj.bounds[0])
+        self.max_bounds[1] = max(self.max_bounds[1], obj.bounds[1])
+
+    def remove_object(self, obj_id):
+        if self.objects.pop(obj_id, None) == None:
+            return
+        del self.order[obj_id]
+        self.moving.pop(obj_id, None)
+        cell = self.static_cells.pop(obj_id, None)
+        if cell != None:
+            del self.cells[cell][obj_id]
+
+    def draw_order(self, obj):
+        return self.order[obj.id]
+
+    def visible(self, camera_position, width, height):
+        # every object which could be on a width x height screen at camera_position, in the order they're drawn
+        # static objects well off screen are left out, but the caller still has to check the rest
+        parallax_x, parallax_y = self.parallax.x, self.parallax.y
+        if parallax_x <= 0 or parallax_y <= 0:
+            # the whole layer is pinned to (or moves against) the camera, the grid doesn't help
+            return list(self.objects.values())
+
+        # on screen, (position - camera) * parallax is between -bounds and the screen size
+        # with an extra unit either side so rounding can't leave anything out
+        cell_size = self.cell_size
+        left = math.floor((camera_position[0] - self.max_bounds[0] / parallax_x - 1) / cell_size)
+        right = math.floor((camera_position[0] + width / parallax_x + 1) / cell_size)
+        top = math.floor((camera_position[1] - self.max_bounds[1] / parallax_y - 1) / cell_size)
+        bottom = math.floor((camera_position[1] + height / parallax_y + 1) / cell_size)
+
+        candidates = list(self.moving.values())
+        cells = self.cells
+        for cell_x in range(left, right + 1):
+            for cell_y in range(top, bottom + 1):
+                cell = cells.get((cell_x, cell_y))
+                if cell != None:
+                    candidates.extend(cell.values())
+        candidates.sort(key=self.draw_order)
+        return candidates
 
 # never use this - it's a base class
 class EventHandler():
@@ -93,8 +153,8 @@ class TrackEventHandler(EventHandler):
                 new_position[1] = clamp_between(new_position[1], low, high - self.object.bounds[1])
                 new_speed[1] = 0
         
-        self.object.speed = (new_speed[0], new_speed[1])
-        self.object.position = (new_position[0], new_position[1])
+        self.object.speed = Vec2(new_speed[0], new_speed[1])
+        self.object.position = Vec2(new_position[0], new_position[1])
 
 
 class FpsCounter():
@@ -184,20 +244,20 @@ class Game():
 
         self.layers = [Layer(0, parallax=Vec2(0,0)), Layer(1, parallax=Vec2(0.5, 0.5)), Layer(3,parallax=Vec2(0.75,0.75)), Layer(2)]
         self.layers[0].add_object(self.background)
-        self.layers[1].add_object(self.mountains)
+        self.layers[1].add_object(self.mountains, static=True)
         self.layers[3].add_object(self.ball)
 
         tree_spacing = 500
         for i in range(5):
             new_tree = GameObject(position=Vec2(i * tree_spacing, 640), bounds=Vec2(640,640), sprite=tree_sprite)
             self.objects[new_tree.id] = new_tree
-            self.layers[2].add_object(new_tree)
+            self.layers[2].add_object(new_tree, static=True)
 
         spacing = 159
         for i in range(10):
             new_ground = GameObject(position=Vec2(i * spacing, 1200), bounds=Vec2(159,159), sprite=ground_tile)
             self.objects[new_ground.id] = new_ground
-            self.layers[3].add_object(new_ground)
+            self.layers[3].add_object(new_ground, static=True)
 
         # width = 10
         # height = 10
@@ -224,10 +284,11 @@ class Game():
     def update(self, timestamp):
         for obj in self.physics_objects:
             new_position = obj.position + obj.speed
-            if (new_position[0] < self.bounds[0] or new_position[0] + obj.bounds[0] > self.bounds[1]):
-                new_position = new_position - Vec2(obj.speed.x, 0)
-            if (new_position[1] < self.bounds[0] or new_position[1] + obj.bounds[1] > self.bounds[1]):
-                new_position = new_position - Vec2(0, obj.speed.y)
+            # new_position is a fresh vector, so it can be changed in place
+            if (new_position.x < self.bounds[0] or new_position.x + obj.bounds.x > self.bounds[1]):
+                new_position.x -= obj.speed.x
+            if (new_position.y < self.bounds[0] or new_position.y + obj.bounds.y > self.bounds[1]):
+                new_position.y -= obj.speed.y
             obj.position = new_position
             obj.last_updated = timestamp
 
@@ -240,8 +301,8 @@ class Game():
         width = self.width
 
         for layer in self.layers:
-            for obj_id in layer.objects:
-                obj = self.objects[obj_id]
+            # only what's near the camera, instead of every object in the layer
+            for obj in layer.visible(self.camera.position, self.width, self.height):
                 obj_screen_position = ((obj.position[0] - self.camera.position[0]) * layer.parallax.x, (obj.position[1] - self.camera.position[1]) * layer.parallax.y)
 
                 if obj_screen_position[0] + obj.bounds[0] < 0 or obj_screen_position[0] > self.width or obj_screen_position[1] + obj.bounds[1] < 0 or obj_screen_position[1] > self.height:
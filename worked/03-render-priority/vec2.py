@@ -1,49 +1,82 @@
 import numbers
 
 class Vec2():
-    
+    # no __dict__, so each vector is smaller and x / y lookups are faster
+    __slots__ = ("x", "y")
+
     def __init__(self, x = 0, y = 0):
-        if not (isinstance(x, numbers.Number) and isinstance(y, numbers.Number)):
+        # int and float are nearly always what we get, checking the exact type is much cheaper than the numbers ABC
+        if not ((x.__class__ is int or x.__class__ is float or isinstance(x, numbers.Number)) and (y.__class__ is int or y.__class__ is float or isinstance(y, numbers.Number))):
             raise TypeError()
 
         self.x = x
         self.y = y
 
+    @classmethod
+    def unchecked(cls, x, y):
+        # skips __init__ and its type checks, for when x and y are known to be numbers (e.g. they came out of another Vec2)
+        v = object.__new__(cls)
+        v.x = x
+        v.y = y
+        return v
+
+    # the operators always make a new vector, so a Vec2 which is shared (like a default argument) is never changed by them
+    # use iadd / isub on vectors you own to avoid the allocation
+
     def __add__(self, other):
-        if not isinstance(other, Vec2):
+        if other.__class__ is not Vec2 and not isinstance(other, Vec2):
             raise TypeError()
 
-        return Vec2(self.x + other.x, self.y + other.y)
+        return Vec2.unchecked(self.x + other.x, self.y + other.y)
 
     def __sub__(self, other):
-        if not isinstance(other, Vec2):
+        if other.__class__ is not Vec2 and not isinstance(other, Vec2):
             raise TypeError()
 
-        return Vec2(self.x - other.x, self.y - other.y)
+        return Vec2.unchecked(self.x - other.x, self.y - other.y)
 
     def __mul__(self, other):
-        if not isinstance(other, numbers.Number):
+        if other.__class__ is not int and other.__class__ is not float and not isinstance(other, numbers.Number):
             # note multiplying by another vector is also nonsensical as dot product, cross product are different operations
-            # divide operation not implemented because it's mathematically invalid, pass 1 / scalar to mul if you want this function 
+            # divide operation not implemented because it's mathematically invalid, pass 1 / scalar to mul if you want this function
             raise TypeError()
 
-        return Vec2(self.x * other, self.y * other)
+        return Vec2.unchecked(self.x * other, self.y * other)
 
     def __getitem__(self,key):
-        if not isinstance(key, int):
+        if key.__class__ is not int and not isinstance(key, int):
             raise TypeError()
-        if not (key == 0 or key == 1):
-            raise ValueError()
         if key == 0:
             return self.x
         elif key == 1:
             return self.y
+        raise ValueError()
+
+    def iadd(self, other):
+        # in place version of +, returns self so it can be chained
+        if other.__class__ is not Vec2 and not isinstance(other, Vec2):
+            raise TypeError()
+
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def isub(self, other):
+        if other.__class__ is not Vec2 and not isinstance(other, Vec2):
+            raise TypeError()
+
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def copy(self):
+        return Vec2.unchecked(self.x, self.y)
 
     def negate(self):
-        return Vec2(-self.x, -self.y)
+        return Vec2.unchecked(-self.x, -self.y)
 
     def as_tuple(self):
         return (self.x, self.y)
 
     def as_list(self):
-        return [self.x, self.y]
\ No newline at end of file
+        return [self.x, self.y]
@@ -0,0 +1,71 @@
+import pygame
+
+class TextureAtlas():
+    # packs a lot of small images into one big surface, and hands out subsurfaces of it in their place
+    # a subsurface blits exactly like the image it was copied from, but every sprite shares the same pixels,
+    # so there is one texture in memory and nothing gets loaded twice
+    #
+    #   atlas = TextureAtlas()
+    #   atlas.add("player", pygame.image.load("assets/player.png"))
+    #   atlas.pack()
+    #   sprite = atlas["player"]
+    def __init__(self, max_width = 1024, align = 4, alpha = True):
+        self.max_width = max_width
+        # images start on a multiple of this many pixels, SDL's fast blitters copy 16 bytes at a time and an
+        # image starting on an odd pixel can take twice as long to blit as the loose surface did
+        self.align = align
+        self.alpha = alpha # opaque images (like tiles) blit faster from an atlas without per pixel alpha
+        self.images = {} # key -> loose surface, until pack()
+        self.regions = {} # key -> Rect in the atlas
+        self.sprites = {} # key -> subsurface of the atlas
+        self.surface = None
+
+    def add(self, key, image : pygame.Surface):
+        if self.surface != None:
+            raise ValueError("Can't add to an atlas once it's packed")
+        self.images[key] = image
+
+    def pack(self):
+        # shelf packing: tallest images first, left to right, starting a new shelf when a row is full
+        # not optimal, but images of similar heights end up on the same shelf which wastes little space
+        order = sorted(self.images.keys(), key=lambda key: self.images[key].get_height(), reverse=True)
+        width = max([self.max_width] + [image.get_width() for image in self.images.values()])
+
+        x = 0
+        y = 0
+        shelf_height = 0
+        used_width = 0
+        for key in order:
+            w, h = self.images[key].get_size()
+            if x + w > width:
+                x = 0
+                y += shelf_height
+                shelf_height = 0
+            self.regions[key] = pygame.Rect(x, y, w, h)
+            used_width = max(used_width, x + w)
+            x += -(-w // self.align) * self.align
+            shelf_height = max(shelf_height, h)
+        height = y + shelf_height
+
+        size = (max(1, used_width), max(1, height))
+        if self.alpha:
+            self.surface = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+            self.surface.fill((0, 0, 0, 0))
+        else:
+            self.surface = pygame.Surface(size).convert()
+        for key, area in self.regions.items():
+            if self.alpha:
+                # a normal blit would blend with the empty atlas, this copies the pixels and alpha across as they are
+                self.surface.blit(self.images[key].convert_alpha(), area, special_flags=pygame.BLEND_RGBA_MAX)
+            else:
+                self.surface.blit(self.images[key], area)
+            self.sprites[key] = self.surface.subsurface(area)
+
+        # the loose copies aren't needed anymore
+        self.images = {}
+
+    def __getitem__(self, key):
+        return self.sprites[key]
+
+    def __contains__(self, key):
+        return key in self.sprites
@@ -0,0 +1,93 @@
+import math
+from gameobject import GameObject
+from sweepprune import SweepAndPrune
+
+# a broadphase takes the list of physics objects for this tick and returns, for each index,
+# the sorted indices of *later* objects which might be colliding with it
+# the narrow phase (check_collision) still decides whether they actually collide
+
+class BruteForceBroadphase():
+    # every object against every later object - the original O(n^2) behaviour, kept for comparison
+    def partners(self, objects : list[GameObject]):
+        count = len(objects)
+        return [range(i + 1, count) for i in range(count)]
+
+class UniformGridBroadphase():
+    # same idea as StaticPartition in chapter 05, but objects go into every cell they touch
+    # and the grid is a dict so objects which have wandered out of bounds still get a cell
+    def __init__(self, cell_size = 64):
+        self.cell_size = cell_size
+
+    def get_cell_range(self, obj : GameObject):
+        # cover both where the object is now and where it will be after this tick
+        # handlers can push an object back to its old position halfway through the tick
+        # the right / bottom edges are inclusive because check_collision counts touching as colliding
+        # the edges are the ones check_collision's Rects end up with, which truncate towards zero - below 0 that's
+        # to the right of the real position, so flooring the floats could put an edge in a cell that was never added
+        x = int(obj.position.x)
+        y = int(obj.position.y)
+        next_x = int(obj.position.x + obj.speed.x)
+        next_y = int(obj.position.y + obj.speed.y)
+        left = min(x, next_x)
+        top = min(y, next_y)
+        right = max(x, next_x) + int(obj.bounds.x)
+        bottom = max(y, next_y) + int(obj.bounds.y)
+        scale = float(self.cell_size)
+        return (math.floor(left / scale), math.floor(top / scale), math.floor(right / scale), math.floor(bottom / scale))
+
+    def partners(self, objects : list[GameObject]):
+        cells = {}
+        for i, obj in enumerate(objects):
+            left, top, right, bottom = self.get_cell_range(obj)
+            for x in range(left, right + 1):
+                for y in range(top, bottom + 1):
+                    cell = cells.get((x, y))
+                    if cell == None:
+                        cells[(x, y)] = [i]
+                    else:
+                        cell.append(i)
+
+        # objects are added in index order, so every cell list is already sorted
+        found = [None] * len(objects)
+        for cell in cells.values():
+            if len(cell) < 2:
+                continue
+            for n, i in enumerate(cell):
+                later = cell[n + 1:]
+                if found[i] == None:
+                    found[i] = set(later)
+                else:
+                    found[i].update(later)
+
+        return [sorted(others) if others != None else () for others in found]
+
+class SweepAndPruneBroadphase():
+    # keeps objects sorted along x between ticks (keyed by id, so the order survives objects being added and removed)
+    def __init__(self):
+        # check_collision counts touching edges as a collision, so the sweep has to as well
+        self.sweep = SweepAndPrune(touching=True)
+
+    def partners(self, objects : list[GameObject]):
+        boxes = {}
+        index_of = {}
+        for i, obj in enumerate(objects):
+            x = obj.position.x
+            y = obj.position.y
+            next_x = x + obj.speed.x
+            next_y = y + obj.speed.y
+            # rounded outwards, so the integer Rects check_collision builds can never be missed
+            boxes[obj.id] = (math.floor(min(x, next_x)), math.floor(min(y, next_y)), math.ceil(max(x, next_x) + obj.bounds.x), math.ceil(max(y, next_y) + obj.bounds.y))
+            index_of[obj.id] = i
+
+        found = [None] * len(objects)
+        for id_1, id_2 in self.sweep.overlapping_pairs(boxes):
+            i = index_of[id_1]
+            j = index_of[id_2]
+            if i > j:
+                i, j = j, i
+            if found[i] == None:
+                found[i] = [j]
+            else:
+                found[i].append(j)
+
+        return [sorted(others) if others != None else () for others in found]
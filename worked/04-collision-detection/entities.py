@@ -0,0 +1,90 @@
+class EntityStore():
+    # every game object lives in a slot, and its id (a "handle") is the slot index plus the slot's generation
+    # when an object is destroyed its slot is reused, but with the generation bumped, so an old handle to it
+    # can never be mistaken for whatever lives in the slot now
+    #
+    # destroying is deferred: the object stops counting as alive straight away (so `id in store` is False
+    # for the rest of the tick), and flush() then removes it from every subsystem in one go
+    #
+    #   store = EntityStore()
+    #   store.add_subsystem(lambda handle: physics.pop(handle, None))
+    #   handle = store.reserve()
+    #   store[handle] = obj
+    #   store.destroy(handle)
+    #   store.flush()
+    index_bits = 20 # up to a million objects alive at once
+    index_mask = (1 << index_bits) - 1
+
+    def __init__(self):
+        self.generations = [] # index -> generation of the handle currently using the slot
+        self.free = [] # indices to reuse, most recently freed last
+        self.pending = [] # handles destroyed but not flushed yet
+        self.subsystems = [] # remove(handle) callbacks, run by flush()
+        self.live = {} # handle -> object, in the order they were added, for iterating and len()
+
+    def add_subsystem(self, remove):
+        self.subsystems.append(remove)
+
+    def reserve(self):
+        # a handle for an object that doesn't exist yet (GameObject needs its id before it's stored)
+        if len(self.free) > 0:
+            index = self.free.pop()
+            self.generations[index] += 1
+        else:
+            index = len(self.generations)
+            if index > EntityStore.index_mask:
+                raise OverflowError("Too many entities")
+            self.generations.append(0)
+        return (self.generations[index] << EntityStore.index_bits) | index
+
+    def is_current(self, handle):
+        # False once the slot has been given to something else
+        index = handle & EntityStore.index_mask
+        return index < len(self.generations) and self.generations[index] == handle >> EntityStore.index_bits
+
+    def __setitem__(self, handle, obj):
+        if not self.is_current(handle):
+            raise KeyError(handle)
+        self.live[handle] = obj
+
+    def __getitem__(self, handle):
+        # same as the dict this replaces: only objects which are alive
+        return self.live[handle]
+
+    def get(self, handle, default = None):
+        return self.live.get(handle, default)
+
+    def __contains__(self, handle):
+        return handle in self.live
+
+    def __delitem__(self, handle):
+        if handle not in self.live:
+            raise KeyError(handle)
+        self.destroy(handle)
+
+    def __len__(self):
+        return len(self.live)
+
+    def __iter__(self):
+        return iter(self.live)
+
+    def values(self):
+        return self.live.values()
+
+    def destroy(self, handle):
+        # safe to call more than once, or with a stale handle
+        if self.live.pop(handle, None) == None:
+            return
+        self.pending.append(handle)
+
+    def flush(self):
+        # take everything destroyed since the last flush out of every subsystem, then free the slots
+        if len(self.pending) == 0:
+            return
+        pending = self.pending
+        self.pending = []
+        for remove in self.subsystems:
+            for handle in pending:
+                remove(handle)
+        for handle in pending:
+            self.free.append(handle & EntityStore.index_mask)
@@ -0,0 +1,71 @@
+import pygame
+import tracing
+
+class EventBus():
+    # instead of sending every event to every listener and letting each one throw away what isn't for it,
+    # handlers subscribe to an event type - either every event of that type, or only the ones about one object
+    # an event about an object is one with an "object" or "object2" field (OUT_OF_BOUNDS, COLLISION, ...)
+    #
+    # the subscriber lists are never changed in place, subscribing makes a new list, so a handler can
+    # subscribe / unsubscribe things while an event is being delivered without breaking the delivery
+    def __init__(self):
+        self.by_type = {} # event type -> [handler] for every event of that type
+        self.by_object = {} # (event type, object id) -> [handler]
+        self.object_types = {} # object id -> {event type} it has subscriptions for
+
+    def subscribe(self, event_type, handler, object_id = None):
+        if object_id == None:
+            self.by_type[event_type] = self.by_type.get(event_type, []) + [handler]
+            return
+        key = (event_type, object_id)
+        self.by_object[key] = self.by_object.get(key, []) + [handler]
+        self.object_types.setdefault(object_id, set()).add(event_type)
+
+    def unsubscribe(self, event_type, handler, object_id = None):
+        if object_id == None:
+            self.by_type[event_type] = [h for h in self.by_type.get(event_type, []) if h is not handler]
+            return
+        key = (event_type, object_id)
+        remaining = [h for h in self.by_object.get(key, []) if h is not handler]
+        if len(remaining) > 0:
+            self.by_object[key] = remaining
+            return
+        self.by_object.pop(key, None)
+        types = self.object_types.get(object_id)
+        if types != None:
+            types.discard(event_type)
+            if len(types) == 0:
+                del self.object_types[object_id]
+
+    def remove_object(self, object_id):
+        # drop every subscription about an object, e.g. once it's been destroyed
+        for event_type in self.object_types.pop(object_id, ()):
+            self.by_object.pop((event_type, object_id), None)
+
+    def publish(self, ev : pygame.event.Event, check = None):
+        # check(handler) is asked before each delivery, so an earlier handler can stop the rest getting it
+        # (e.g. by destroying one of the objects the event is about)
+        event_type = ev.type
+        targets = self.by_type.get(event_type, [])
+        subject = getattr(ev, "object", None)
+        if subject != None:
+            targets = targets + self.by_object.get((event_type, subject), [])
+        other = getattr(ev, "object2", None)
+        if other != None and other != subject:
+            targets = targets + self.by_object.get((event_type, other), [])
+
+        if tracing.enabled:
+            self.deliver_traced(targets, ev, check)
+            return
+        for handler in targets:
+            if check != None and not check(handler):
+                continue
+            handler.on_event(ev)
+
+    def deliver_traced(self, targets, ev : pygame.event.Event, check):
+        # same as the end of publish, with a span around each handler
+        for handler in targets:
+            if check != None and not check(handler):
+                continue
+            with tracing.Span(f"{type(handler).__name__}.on_event", {"type": ev.type, "object": getattr(ev, "object", None)}):
+                handler.on_event(ev)
@@ -0,0 +1,99 @@
+import time
+from collections import deque
+
+class FramePacer():
+    # keeps a loop to a steady frame_time (in seconds) without burning a whole core waiting
+    # time.sleep on its own wakes up late by a different amount every time (often a millisecond or more), so most of
+    # the wait is slept and the last bit is spun on perf_counter_ns. how much is left for spinning follows how late
+    # sleep has actually been waking up on this machine
+    #
+    #   pacer = FramePacer(1 / 30)
+    #   while True:
+    #       for i in range(pacer.ticks()): # fixed timestep updates, at most max_catch_up at once
+    #           update()
+    #       render(pacer.lag())
+    #       pacer.wait() # until the next frame is due
+    def __init__(self, frame_time, max_catch_up = 5, history = 240):
+        self.frame_ns = round(frame_time * 1_000_000_000)
+        self.max_catch_up = max_catch_up # most updates ticks() asks for, any more time than that is dropped
+        self.next_frame = None # when wait() next returns, in perf_counter_ns
+        self.oversleep_ns = 1_000_000 # how late sleep wakes up, starts at a guess and moves towards what's measured
+        self.prev_tick = None
+        self.lag_ns = 0
+        self.dropped_ticks = 0
+        self.prev_frame = None
+        self.intervals = deque(maxlen=history) # ns between the last few wait()s returning
+        self.lateness = deque(maxlen=history) # ns each of the last few wait()s returned after it meant to
+        self.resyncs = 0
+
+    def wait(self):
+        now = time.perf_counter_ns()
+        if self.next_frame == None:
+            self.next_frame = now + self.frame_ns
+
+        # sleep for all but the bit sleep is likely to overshoot by
+        sleep_ns = self.next_frame - now - self.oversleep_ns
+        if sleep_ns > 0:
+            time.sleep(sleep_ns / 1_000_000_000)
+            woke = time.perf_counter_ns()
+            overslept = woke - now - sleep_ns
+            # an eighth of the way towards the latest measurement, but go straight up if it was worse
+            # never more than a quarter of a frame though, or one bad wake up would mean spinning for ages
+            self.oversleep_ns = min(self.frame_ns // 4, max(overslept, self.oversleep_ns + (overslept - self.oversleep_ns) // 8))
+
+        # then spin the rest
+        now = time.perf_counter_ns()
+        while now < self.next_frame:
+            now = time.perf_counter_ns()
+
+        self.lateness.append(now - self.next_frame)
+        if self.prev_frame != None:
+            self.intervals.append(now - self.prev_frame)
+        self.prev_frame = now
+
+        self.next_frame += self.frame_ns
+        if now > self.next_frame:
+            # more than a whole frame behind, start again from now rather than rushing the next few frames
+            self.next_frame = now + self.frame_ns
+            self.resyncs += 1
+
+    def ticks(self):
+        # how many fixed timestep updates are due since the last call
+        now = time.perf_counter_ns()
+        if self.prev_tick == None:
+            self.prev_tick = now
+        self.lag_ns += now - self.prev_tick
+        self.prev_tick = now
+
+        ticks = self.lag_ns // self.frame_ns
+        self.lag_ns -= ticks * self.frame_ns
+        if ticks > self.max_catch_up:
+            # after a long stall (loading, dragging the window), catching up on everything would make the next
+            # frame slow too, and so on - skip the time instead
+            self.dropped_ticks += ticks - self.max_catch_up
+            ticks = self.max_catch_up
+        return ticks
+
+    def lag(self):
+        # how far into the next update we are, 0 - 1, for drawing between updates
+        return self.lag_ns / self.frame_ns
+
+    def stats(self):
+        # in milliseconds
+        intervals = sorted(self.intervals)
+        lateness = sorted(self.lateness)
+        stats = {
+            "frame_ms": self.frame_ns / 1_000_000,
+            "oversleep_ms": self.oversleep_ns / 1_000_000,
+            "resyncs": self.resyncs,
+            "dropped_ticks": self.dropped_ticks,
+        }
+        if len(intervals) > 0:
+            mean = sum(intervals) / len(intervals)
+            stats["mean_interval_ms"] = mean / 1_000_000
+            # how much the time between frames wanders
+            stats["jitter_ms"] = (sum((i - mean) ** 2 for i in intervals) / len(intervals)) ** 0.5 / 1_000_000
+            stats["max_interval_ms"] = intervals[-1] / 1_000_000
+        if len(lateness) > 0:
+            stats["p99_late_ms"] = lateness[min(len(lateness) - 1, int(len(lateness) * 0.99))] / 1_000_000
+        return stats
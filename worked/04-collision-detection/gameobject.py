@@ -2,10 +2,21 @@ from vec2 import Vec2
 
 class GameObject():
     def __init__(self, gm : "Game", my_type : "object", position = Vec2(0,0), bounds=Vec2(0,0), speed = Vec2(0,0), sprite = None):
-        self.id = gm.next_id()
+        # objects made for a pool have no game yet, they get an id when respawn() puts them in it
+        self.id = gm.next_id() if gm != None else None
         self.type = my_type
-        self.position = position
+        # copied so moving this object in place never moves another one sharing the same Vec2
+        self.position = position.copy()
         self.bounds = bounds
-        self.speed = speed
+        self.speed = speed.copy()
         self.sprite = sprite
-        self.last_updated = 0
\ No newline at end of file
+        self.last_updated = 0
+
+    def respawn(self, gm : "Game", position : Vec2, speed : Vec2):
+        # reuse a pooled object: a new id (so any old handle to it goes stale) and the values copied into its own vectors
+        self.id = gm.next_id()
+        self.position.x = position.x
+        self.position.y = position.y
+        self.speed.x = speed.x
+        self.speed.y = speed.y
+        self.last_updated = 0
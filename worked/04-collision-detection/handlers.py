@@ -3,12 +3,14 @@ import pygame
 from gameobject import GameObject
 from vec2 import Vec2
 from utils import clamp_between
+from sweepprune import ContactPhase
 import math
 
 class CustomEvent(IntEnum):
     AFTER_UPDATE = pygame.event.custom_type()
     OUT_OF_BOUNDS = pygame.event.custom_type()
-    COLLISION = pygame.event.custom_type()
+    COLLISION = pygame.event.custom_type() # has a contact field, BEGIN or PERSIST
+    COLLISION_END = pygame.event.custom_type()
 
 # never use this - it's a base class
 class EventHandler():
@@ -24,8 +26,11 @@ class PlayerBulletSpawner(EventHandler):
         self.speed = speed
         self.reload = 0.3
         self.last_shot = 0
-        self.bullet_sprite = pygame.image.load("assets/red-circle-small.png").convert_alpha()
+        self.bullet_sprite = game.sprite_atlas["bullet"]
         self.firing = False
+        # filled in for each shot, spawn_bullet copies them so they can be reused
+        self.spawn_position = Vec2(0, 0)
+        self.spawn_speed = Vec2(0, 0)
         super().__init__(obj)
     
     def on_event(self, ev : pygame.event.Event):
@@ -50,19 +55,17 @@ class PlayerBulletSpawner(EventHandler):
         
         mouse_pos = pygame.mouse.get_pos()
 
-        spawn_location = obj.position + Vec2(obj.bounds[0] / 2, obj.bounds[1] / 2)
-        screen_position = spawn_location - self.game.camera.position
+        spawn_location = self.spawn_position
+        spawn_location.x = obj.position.x + obj.bounds.x / 2
+        spawn_location.y = obj.position.y + obj.bounds.y / 2
+        screen_position = (spawn_location.x - self.game.camera.position.x, spawn_location.y - self.game.camera.position.y)
         
-        diff = Vec2(mouse_pos[0] - screen_position[0], mouse_pos[1] - screen_position[1])
+        diff = (mouse_pos[0] - screen_position[0], mouse_pos[1] - screen_position[1])
         hypothenuse = math.sqrt( (diff[0] ** 2) + (diff[1] ** 2) )
-        unit_speed = Vec2(diff[0] / hypothenuse, diff[1] / hypothenuse)
+        self.spawn_speed.x = diff[0] / hypothenuse * self.speed
+        self.spawn_speed.y = diff[1] / hypothenuse * self.speed
 
-        sprite = GameObject(self.game, "player_bullet", spawn_location, Vec2(16,16), speed=(unit_speed * self.speed), sprite=self.bullet_sprite)
-
-        self.game.objects[sprite.id] = sprite
-        self.game.layers[1].add_object(sprite)
-        self.game.physics_objects.append(sprite)
-        self.game.update_listeners.append( PlayerBulletCollider(self.game, sprite) )
+        self.game.spawn_bullet(spawn_location, self.spawn_speed, self.bullet_sprite)
 
         self.last_shot = ev.timestamp
         
@@ -73,13 +76,14 @@ class PlayerBulletCollider(EventHandler):
         super().__init__(obj)
 
     def remove_self(self):
-        del self.game.objects[self.object.id]
-        # physics object removal should be handled automatically
-        # self.game.physics_objects.remove(self.object)
-        # destroy object
-        # remove self from event handler list
+        # takes effect straight away for liveness checks, the physics / layer / event entries go at the end of the tick
+        self.game.objects.destroy(self.object.id)
 
     def handle_collision(self, ev : pygame.event.Event):
+        # a bullet only needs to react once, the first time it hits something
+        if ev.contact != ContactPhase.BEGIN:
+            return
+
         ignore_list = ["player", "camera"]
 
         type_1 = self.game.objects[ev.object].type
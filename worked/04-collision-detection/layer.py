@@ -1,10 +1,70 @@
+import math
 from vec2 import Vec2
 
 class Layer():
-    def __init__(self, priority = 0, parallax = Vec2(1.0,1.0)):
+    # things which never move (tiles, scenery) are put in a grid of cell_size squares by position, so rendering only
+    # has to look at the cells around the camera instead of every object in the layer
+    # anything else is checked every frame, same as before
+    def __init__(self, priority = 0, parallax = Vec2(1.0,1.0), cell_size = 256):
         self.priority = priority
         self.parallax = parallax
-        self.objects = [] # store by index
-    
-    def add_object(self, obj):
-        self.objects.append(obj.id)
\ No newline at end of file
+        self.objects = {} # id -> object, in the order they're drawn
+        self.order = {} # id -> place in the draw order
+        self.next_order = 0
+        self.moving = {} # id -> object, anything not in the grid
+        self.cell_size = cell_size
+        self.cells = {} # (cell x, cell y) -> {id: object} for static objects
+        self.static_cells = {} # id -> cell, for removing static objects
+        self.max_bounds = [0, 0] # biggest static object, how far before its cell one can reach onto the screen
+
+    def add_object(self, obj, static = False):
+        # static objects have to stay where they were when they were added
+        self.objects[obj.id] = obj
+        self.order[obj.id] = self.next_order
+        self.next_order += 1
+        if not static:
+            self.moving[obj.id] = obj
+            return
+        cell = (math.floor(obj.position[0] / self.cell_size), math.floor(obj.position[1] / self.cell_size))
+        self.cells.setdefault(cell, {})[obj.id] = obj
+        self.static_cells[obj.id] = cell
+        self.max_bounds[0] = max(self.max_bounds[0], obj.bounds[0])
+        self.max_bounds[1] = max(self.max_bounds[1], obj.bounds[1])
+
+    def remove_object(self, obj_id):
+        if self.objects.pop(obj_id, None) == None:
+            return
+        del self.order[obj_id]
+        self.moving.pop(obj_id, None)
+        cell = self.static_cells.pop(obj_id, None)
+        if cell != None:
+            del self.cells[cell][obj_id]
+
+    def draw_order(self, obj):
+        return self.order[obj.id]
+
+    def visible(self, camera_position, width, height):
+        # every object which could be on a width x height screen at camera_position, in the order they're drawn
+        # static objects well off screen are left out, but the caller still has to check the rest
+        parallax_x, parallax_y = self.parallax.x, self.parallax.y
+        if parallax_x <= 0 or parallax_y <= 0:
+            # the whole layer is pinned to (or moves against) the camera, the grid doesn't help
+            return list(self.objects.values())
+
+        # on screen, (position - camera) * parallax is between -bounds and the screen size
+        # with an extra unit either side so rounding can't leave anything out
+        cell_size = self.cell_size
+        left = math.floor((camera_position[0] - self.max_bounds[0] / parallax_x - 1) / cell_size)
+        right = math.floor((camera_position[0] + width / parallax_x + 1) / cell_size)
+        top = math.floor((camera_position[1] - self.max_bounds[1] / parallax_y - 1) / cell_size)
+        bottom = math.floor((camera_position[1] + height / parallax_y + 1) / cell_size)
+
+        candidates = list(self.moving.values())
+        cells = self.cells
+        for cell_x in range(left, right + 1):
+            for cell_y in range(top, bottom + 1):
+                cell = cells.get((cell_x, cell_y))
+                if cell != None:
+                    candidates.extend(cell.values())
+        candidates.sort(key=self.draw_order)
+        return candidates
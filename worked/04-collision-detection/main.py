@@ -3,22 +3,39 @@ from enum import IntEnum
 from vec2 import Vec2
 from utils import clamp_between, check_collision
 from random import randint
-from handlers import MoveEventHandler, PlayerBulletSpawner, TrackEventHandler, CustomEvent
+from handlers import EventHandler, MoveEventHandler, PlayerBulletSpawner, PlayerBulletCollider, TrackEventHandler, CustomEvent
 from gameobject import GameObject
 from layer import Layer
-from fpscounter import FpsCounter
+from profiler import Profiler
+from framepacer import FramePacer
+import tracing
+import broadphase
+from sweepprune import ContactTracker
+from atlas import TextureAtlas
+from eventbus import EventBus
+from entities import EntityStore
+from pool import ObjectPool
 pygame.init()
 
+# "brute" checks everything with everything, "sweep_and_prune" keeps a sorted order between ticks
+broadphase_type = "grid" # any key of broadphases
+broadphases = {
+    "brute": broadphase.BruteForceBroadphase,
+    "grid": broadphase.UniformGridBroadphase,
+    "sweep_and_prune": broadphase.SweepAndPruneBroadphase
+}
+
 black = (0, 0, 0)
 red_circle = pygame.image.load("assets/player.png")
 ground_tileset = pygame.image.load("assets/grass-tiles.png")
 statue_img = pygame.image.load("assets/statue.png")
+bullet_img = pygame.image.load("assets/red-circle-small.png")
 
 class Game():
 
     instance = None
 
-    def __init__(self):
+    def __init__(self, physics_broadphase = None):
         self.size = self.width, self.height = (960, 640)
         self.screen = pygame.display.set_mode(self.size)
         self.bounds = (0, 1320) # minimum and maximum values of object positions
@@ -26,26 +43,51 @@ class Game():
         self.layers = []
         self.fps = 1 / 30
         self.key_listeners : list[EventHandler] = []
-        self.update_listeners : list[EventHandler] = []
         self.mouse_listeners : list[EventHandler] = []
-        self._id = 0
-        self.objects = {}
+        # update events (AFTER_UPDATE, OUT_OF_BOUNDS, COLLISION...) only go to the handlers subscribed to them
+        self.events = EventBus()
+        # every object by id, destroying one takes it out of physics, the layers and the event bus at the end of the tick
+        self.objects = EntityStore()
+        self.objects.add_subsystem(self.forget)
+        self.physics_objects = {} # id -> object, in the order they're updated
+        # bullets and their colliders are recycled rather than made for every shot
+        self.bullet_pool = ObjectPool(self.create_bullet, capacity=1024)
+        self.live_bullets = {} # id -> (bullet, collider) out of bullet_pool
+        self.objects.add_subsystem(self.recycle_bullet)
+        # see broadphase_type
+        self.broadphase = physics_broadphase if physics_broadphase != None else broadphases[broadphase_type]()
+        self.contacts = ContactTracker()
         Game.instance = self
         self.tileset = ground_tileset.convert()
+        # every sprite is a subsurface of one of two atlases, the tiles don't need alpha so they get their own
+        self.tile_atlas = TextureAtlas(alpha=False)
+        for x in range(8):
+            # it's 8 x 8 tiles of 32 x 32px, scaled to 64 x 64
+            for y in range(8):
+                area = pygame.rect.Rect(x * 32, y * 32, 32, 32)
+                self.tile_atlas.add(("grass", x, y), pygame.transform.scale2x(self.tileset.subsurface(area)))
+        self.tile_atlas.pack()
+        self.sprite_atlas = TextureAtlas()
+        self.sprite_atlas.add("player", red_circle)
+        self.sprite_atlas.add("statue", statue_img)
+        self.sprite_atlas.add("bullet", bullet_img)
+        self.sprite_atlas.pack()
         self.tiles = []
         for x in range(8):
-            # it's 8 x 8 tiles of 32 x 32px
-            # scale to 64 x 64 and load to a 2d array
+            # load to a 2d array
             col = []
             for y in range(8):
-                area = pygame.rect.Rect(x * 32, y * 32, 32, 32)
-                col.append(pygame.transform.scale2x(self.tileset.subsurface(area)))
+                col.append(self.tile_atlas["grass", x, y])
             self.tiles.append(col)
 
     def next_id(self):
-        cur = self._id
-        self._id += 1
-        return cur
+        return self.objects.reserve()
+
+    def forget(self, obj_id):
+        self.physics_objects.pop(obj_id, None)
+        for layer in self.layers:
+            layer.remove_object(obj_id)
+        self.events.remove_object(obj_id)
 
     def add_layer(self, new_layer):
         # do a binary search based insert at correct position
@@ -75,11 +117,11 @@ class Game():
 
     def setup(self):
 
-        self.fps_counter = FpsCounter()
+        self.profiler = Profiler(self.fps)
         self.camera = GameObject(self, "camera", bounds=Vec2(960,640))
-        self.player = GameObject(self, "player", position=Vec2(320,240), bounds=Vec2(35,47), sprite=red_circle.convert_alpha())
+        self.player = GameObject(self, "player", position=Vec2(320,240), bounds=Vec2(35,47), sprite=self.sprite_atlas["player"])
 
-        self.physics_objects = [self.player, self.camera]
+        self.physics_objects = {self.player.id: self.player, self.camera.id: self.camera}
         
         self.objects[self.camera.id] = self.camera
         self.objects[self.player.id] = self.player
@@ -90,7 +132,7 @@ class Game():
                 tile_sprite = self.tiles[randint(0, 7)][randint(0, 3)]
                 cur_tile = GameObject(self, "tile", position=Vec2(x * 64, y * 64), bounds=Vec2(64, 64), sprite=tile_sprite)
                 self.objects[cur_tile.id] = cur_tile
-                self.layers[0].add_object(cur_tile)
+                self.layers[0].add_object(cur_tile, static=True)
 
         player_pos = self.player.position
         player_bounds = self.player.bounds
@@ -102,10 +144,10 @@ class Game():
             while check_collision(player_pos, statue_pos, player_bounds, statue_bounds):
                 statue_pos = Vec2(randint(self.bounds[0], self.bounds[1] - statue_bounds.x),randint(self.bounds[0], self.bounds[1] - statue_bounds.y))
             
-            statue = GameObject(self, "statue", position=statue_pos, bounds=Vec2(37,72), sprite=statue_img.convert_alpha())
-            self.physics_objects.append(statue)
+            statue = GameObject(self, "statue", position=statue_pos, bounds=Vec2(37,72), sprite=self.sprite_atlas["statue"])
+            self.physics_objects[statue.id] = statue
             self.objects[statue.id] = statue
-            self.layers[1].add_object(statue)
+            self.layers[1].add_object(statue, static=True)
 
         self.layers[1].add_object(self.player)
 
@@ -114,12 +156,46 @@ class Game():
 
         self.key_listeners = [move_handler]
         self.mouse_listeners = [bullet_spawner]
-        self.update_listeners = [TrackEventHandler(self, self.camera, self.player), bullet_spawner, move_handler]
+        self.events.subscribe(CustomEvent.AFTER_UPDATE, TrackEventHandler(self, self.camera, self.player))
+        self.events.subscribe(CustomEvent.AFTER_UPDATE, bullet_spawner)
+        self.events.subscribe(CustomEvent.OUT_OF_BOUNDS, move_handler, self.player.id)
+        self.events.subscribe(CustomEvent.COLLISION, move_handler, self.player.id)
+
+    def create_bullet(self):
+        bullet = GameObject(None, "player_bullet", bounds=Vec2(16,16))
+        return (bullet, PlayerBulletCollider(self, bullet))
+
+    def recycle_bullet(self, obj_id):
+        pooled = self.live_bullets.pop(obj_id, None)
+        if pooled != None:
+            self.bullet_pool.release(pooled)
+
+    def spawn_bullet(self, position : Vec2, speed : Vec2, sprite : pygame.Surface):
+        # position and speed are copied, so the caller can reuse them
+        pooled = self.bullet_pool.acquire()
+        if pooled == None:
+            # too many bullets already
+            return None
+        bullet, collider = pooled
+        bullet.respawn(self, position, speed)
+        bullet.sprite = sprite
+        self.live_bullets[bullet.id] = pooled
+
+        self.objects[bullet.id] = bullet
+        self.layers[1].add_object(bullet)
+        self.physics_objects[bullet.id] = bullet
+        self.events.subscribe(CustomEvent.OUT_OF_BOUNDS, collider, bullet.id)
+        self.events.subscribe(CustomEvent.COLLISION, collider, bullet.id)
+        return bullet
 
     def process_input(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT: sys.exit()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+                # F5 starts recording a trace, F5 again writes it out
+                tracing.toggle()
             if event.type == pygame.KEYDOWN or event.type == pygame.KEYUP:
+                self.profiler.on_event(event)
                 for listener in self.key_listeners:
                     listener.on_event(event)
             if event.type == pygame.MOUSEBUTTONDOWN or event.type == pygame.MOUSEBUTTONUP:
@@ -127,14 +203,20 @@ class Game():
                     listener.on_event(event)
 
 
+    def is_live(self, handler : EventHandler):
+        return handler.object.id in self.objects
+
+    @tracing.traced("Game.update")
     def update(self, timestamp):
         
-        new_physics_objs = []
-        for i, obj in enumerate(self.physics_objects):
+        physics_objs = list(self.physics_objects.values())
+        partners = self.broadphase.partners(physics_objs)
+        self.contacts.begin_tick()
+
+        for i, obj in enumerate(physics_objs):
             if obj.id not in self.objects:
                 continue
 
-            new_physics_objs.append(obj)
             new_position = obj.position + obj.speed
             out_of_bounds = False
             if (new_position[0] < self.bounds[0] or new_position[0] + obj.bounds[0] > self.bounds[1]):
@@ -142,84 +224,93 @@ class Game():
             if (new_position[1] < self.bounds[0] or new_position[1] + obj.bounds[1] > self.bounds[1]):
                 out_of_bounds = True
             if out_of_bounds:
-                for listener in self.update_listeners:
-                    listener.on_event(pygame.event.Event(CustomEvent.OUT_OF_BOUNDS, {"object": obj.id}))
+                self.events.publish(pygame.event.Event(CustomEvent.OUT_OF_BOUNDS, {"object": obj.id}))
 
-            for obj2 in self.physics_objects[i + 1:]:
+            # only check the objects the broadphase says might be touching this one
+            for j in partners[i]:
+                obj2 = physics_objs[j]
                 if obj2.id not in self.objects:
                     continue
 
                 if check_collision(obj.position + obj.speed, obj2.position + obj2.speed, obj.bounds, obj2.bounds):
-                    for listener in self.update_listeners:
-                        if listener.object.id not in self.objects or obj.id not in self.objects or obj2.id not in self.objects:
-                            continue
+                    # BEGIN the first tick they touch, PERSIST every tick after that
+                    contact = self.contacts.touch(obj.id, obj2.id)
+                    # stop delivering as soon as a handler destroys either object
+                    def both_live(listener):
+                        return listener.object.id in self.objects and obj.id in self.objects and obj2.id in self.objects
 
-                        listener.on_event(pygame.event.Event(CustomEvent.COLLISION, {"object": obj.id, "object2": obj2.id}))
+                    self.events.publish(pygame.event.Event(CustomEvent.COLLISION, {"object": obj.id, "object2": obj2.id, "contact": contact}), both_live)
             
-            obj.position = obj.position + obj.speed # needs to account for any updates resulting from collisions
+            obj.position.iadd(obj.speed) # needs to account for any updates resulting from collisions
             obj.last_updated = timestamp
 
-        self.physics_objects = new_physics_objs
-
-        new_listeners = []
-        for listener in self.update_listeners:
-            if listener.object.id not in self.objects:
+        for id_1, id_2 in self.contacts.end_tick():
+            # destroyed objects don't get told they stopped touching something
+            if id_1 not in self.objects or id_2 not in self.objects:
                 continue
+            self.events.publish(pygame.event.Event(CustomEvent.COLLISION_END, {"object": id_1, "object2": id_2}), self.is_live)
 
-            new_listeners.append(listener)
-            listener.on_event(pygame.event.Event(CustomEvent.AFTER_UPDATE,{"timestamp": timestamp}))
+        self.events.publish(pygame.event.Event(CustomEvent.AFTER_UPDATE,{"timestamp": timestamp}), self.is_live)
 
-        self.update_listeners = new_listeners
+        # anything destroyed this tick leaves physics, the layers and the event bus in one go
+        self.objects.flush()
 
 
+    @tracing.traced("Game.render")
     def render(self, correction : float):
+        self.profiler.start("render")
         self.screen.fill(black)
 
         width = self.width
         final_correction = 0
 
         for layer in self.layers:
-            new_objects = []
-            for obj_id in layer.objects:
-                if obj_id not in self.objects:
-                    # object no longer exists, don't include in new objects list
-                    continue
-                
-                new_objects.append(obj_id)
-                obj = self.objects[obj_id]
+            # one blits() call per layer instead of a blit() per object
+            batch = []
+            # only what's near the camera, instead of every object in the layer
+            for obj in layer.visible(self.camera.position, self.width, self.height):
                 obj_screen_position = ((obj.position[0] + (obj.speed[0] * final_correction) - self.camera.position[0]) * layer.parallax.x, (obj.position[1] + (obj.speed[1] * final_correction) - self.camera.position[1]) * layer.parallax.y)
 
                 if obj_screen_position[0] + obj.bounds[0] < 0 or obj_screen_position[0] > self.width or obj_screen_position[1] + obj.bounds[1] < 0 or obj_screen_position[1] > self.height:
                     # object is off screen, don't bother rendering    
                     continue
 
-                self.screen.blit(obj.sprite, obj_screen_position)
+                batch.append((obj.sprite, obj_screen_position))
 
-            layer.objects = new_objects
-        self.fps_counter.render(self.screen, ( width - (width / 5), 20 ))
+            self.screen.blits(batch, False)
+        self.profiler.render(self.screen, ( width - 10, 20 ))
+        self.profiler.stop("render")
 
-        pygame.display.flip()
+        with self.profiler.phase("flip"):
+            pygame.display.flip()
 
-    def main(self):
+    def main(self, max_fps = None):
+        # updates at a fixed rate (at most 5 at once after a stall), rendering as fast as it can unless capped at max_fps
         self.setup()
 
-        prev = time.time()
-        lag = 0.0
+        pacer = FramePacer(self.fps)
+        render_pacer = None
+        if max_fps != None:
+            render_pacer = FramePacer(1 / max_fps)
 
         while(True):
             current = time.time()
-            delta = current - prev
-            prev = current
-            lag += delta
-            
-            self.process_input()
 
-            while(lag >= self.fps):
-                self.update(current)
-                lag -= self.fps
+            # everything up to the next begin_frame counts as this frame, waiting for the next one included
+            self.profiler.begin_frame()
+            with tracing.span("frame"):
+                with self.profiler.phase("input"):
+                    self.process_input()
+
+                for i in range(pacer.ticks()):
+                    with self.profiler.phase("update"):
+                        self.update(current)
+
+                self.render(pacer.lag())
 
-            self.render(lag / self.fps)
+            if render_pacer != None:
+                render_pacer.wait()
 
 if __name__ == "__main__":
     game = Game()
-    game.main()
\ No newline at end of file
+    game.main(120)
\ No newline at end of file
@@ -0,0 +1,57 @@
+class ObjectPool():
+    # keeps objects which have been finished with so they can be handed out again, instead of making new ones
+    # for short lived things (bullets, damage numbers) this means nothing is allocated once the pool has warmed up,
+    # so there's less for the garbage collector to do in the middle of a fight
+    #
+    # the pool doesn't know how to reset an object, whoever acquires one has to set it up again
+    def __init__(self, create, capacity = 256, max_live = None, prealloc = 0):
+        self.create = create # create() -> a new object, only called when the pool is empty
+        self.capacity = capacity # most objects kept waiting in the pool, anything released past that is dropped
+        self.max_live = max_live # most objects handed out at once, None for no limit
+        self.free = []
+        self.live = 0
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+        self.dropped = 0
+        self.refused = 0
+        self.peak_live = 0
+        for i in range(min(prealloc, capacity)):
+            self.free.append(create())
+            self.created += 1
+
+    def acquire(self):
+        # returns None if max_live objects are already out
+        if self.max_live != None and self.live >= self.max_live:
+            self.refused += 1
+            return None
+        if len(self.free) > 0:
+            obj = self.free.pop()
+            self.reused += 1
+        else:
+            obj = self.create()
+            self.created += 1
+        self.live += 1
+        if self.live > self.peak_live:
+            self.peak_live = self.live
+        return obj
+
+    def release(self, obj):
+        self.live -= 1
+        self.released += 1
+        if len(self.free) < self.capacity:
+            self.free.append(obj)
+        else:
+            self.dropped += 1
+
+    def stats(self):
+        return {
+            "live": self.live,
+            "free": len(self.free),
+            "peak_live": self.peak_live,
+            "created": self.created,
+            "reused": self.reused,
+            "released": self.released,
+            "dropped": self.dropped,
+            "refused": self.refused,
+        }
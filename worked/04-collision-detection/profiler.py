@@ -0,0 +1,164 @@
+import pygame
+import time
+from collections import deque
+from textcache import TextCache
+
+class PhaseTimer():
+    # what profiler.phase(name) hands back, made once per phase so timing doesn't allocate
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.start(self.name)
+
+    def __exit__(self, *exc):
+        self.profiler.stop(self.name)
+
+class Profiler():
+    # times each phase of every frame (input, update ticks, render, flip) and keeps the last `history` frames,
+    # so it can show percentiles and a graph of which phase went over budget
+    #
+    #   profiler.begin_frame()
+    #   with profiler.phase("input"):
+    #       process_input()
+    #   ...
+    #   profiler.end_frame()
+    #
+    # F3 turns the graph on and off, F4 writes the last frames to a csv (see on_event)
+    phases = ["input", "update", "render", "flip"]
+    colours = {"input": (80, 160, 255), "update": (255, 200, 60), "render": (90, 220, 120), "flip": (200, 110, 255)}
+
+    def __init__(self, budget = 1 / 30, history = 300, dump_frames = 300):
+        self.budget_ms = budget * 1000
+        self.dump_frames = dump_frames # how many frames F4 writes
+        self.frames = deque(maxlen=history) # (total ms, update ticks, {phase: ms}) for each finished frame
+        self.timers = {}
+        self.started = {} # phase -> perf_counter_ns it was started at
+        self.current = dict.fromkeys(self.phases, 0) # ns spent in each phase this frame
+        self.ticks = 0 # update ticks this frame
+        self.frame_start = None
+        self.show_graph = False
+        self.font = pygame.font.Font(None, 20)
+        self.text_cache = TextCache(max_entries=64)
+        # the text only changes 4 times a second, like the old fps counter
+        self.lines = []
+        self.prev_text = 0
+        self.frames_since_text = 0
+        self.fps = 0
+
+    def phase(self, name):
+        timer = self.timers.get(name)
+        if timer == None:
+            timer = PhaseTimer(self, name)
+            self.timers[name] = timer
+        return timer
+
+    def start(self, name):
+        self.started[name] = time.perf_counter_ns()
+
+    def stop(self, name):
+        self.current[name] = self.current.get(name, 0) + time.perf_counter_ns() - self.started[name]
+        if name == "update":
+            self.ticks += 1
+
+    def begin_frame(self):
+        now = time.perf_counter_ns()
+        if self.frame_start != None:
+            self.end_frame(now)
+        self.frame_start = now
+
+    def end_frame(self, now = None):
+        # begin_frame calls this, so the time between frames (sleeping, waiting for vsync) counts towards the total
+        if self.frame_start == None:
+            return
+        if now == None:
+            now = time.perf_counter_ns()
+        self.frames.append(((now - self.frame_start) / 1_000_000, self.ticks, {name: ns / 1_000_000 for name, ns in self.current.items()}))
+        for name in self.current:
+            self.current[name] = 0
+        self.ticks = 0
+        self.frame_start = None
+        self.frames_since_text += 1
+
+    def percentiles(self, phase = None, frames = None):
+        # (p50, p95, p99) in ms over the frames kept (or `frames`), for one phase or the whole frame if phase is None
+        if frames == None:
+            frames = self.frames
+        if phase == None:
+            samples = sorted(frame[0] for frame in frames)
+        else:
+            samples = sorted(frame[2].get(phase, 0) for frame in frames)
+        if len(samples) == 0:
+            return (0, 0, 0)
+        last = len(samples) - 1
+        return (samples[int(last * 0.5)], samples[int(last * 0.95)], samples[int(last * 0.99)])
+
+    def over_budget(self):
+        return sum(1 for frame in self.frames if frame[0] > self.budget_ms)
+
+    def dump(self, path = None, frames = None):
+        # the last `frames` frames as a csv, one row a frame with every phase in ms
+        if frames == None:
+            frames = self.dump_frames
+        if path == None:
+            path = f"profile-{time.strftime('%Y%m%d-%H%M%S')}.csv"
+        recent = list(self.frames)[-frames:]
+        with open(path, "w") as f:
+            f.write("frame_ms,update_ticks," + ",".join(f"{name}_ms" for name in self.phases) + "\n")
+            for total, ticks, times in recent:
+                f.write(f"{total:.3f},{ticks}," + ",".join(f"{times.get(name, 0):.3f}" for name in self.phases) + "\n")
+        print(f"Wrote {len(recent)} frames to {path}, {self.over_budget()} of the last {len(self.frames)} over {self.budget_ms:.1f}ms")
+        return path
+
+    def on_event(self, ev : pygame.event.Event):
+        if ev.type != pygame.KEYDOWN:
+            return
+        if ev.key == pygame.K_F3:
+            self.show_graph = not self.show_graph
+        elif ev.key == pygame.K_F4:
+            self.dump()
+
+    def update_text(self):
+        now = time.time()
+        if now <= self.prev_text + 0.25:
+            return
+        self.fps = self.frames_since_text * 4
+        self.frames_since_text = 0
+        self.prev_text = now
+        # one copy of the window for every percentile this refresh, each series only sorted once
+        frames = list(self.frames)
+        p50, p95, p99 = self.percentiles(None, frames)
+        self.lines = [f"FPS: {self.fps}", f"frame p50 / p95 / p99: {p50:.1f} / {p95:.1f} / {p99:.1f}ms"]
+        if self.show_graph:
+            for name in self.phases:
+                p50, p95, p99 = self.percentiles(name, frames)
+                self.lines.append(f"{name} {p50:.1f} / {p95:.1f} / {p99:.1f}")
+
+    def render(self, surface : pygame.Surface, position):
+        # position is the top right corner, each line is right aligned to it so the long ones aren't cut off
+        self.update_text()
+        right, y = position
+        for line in self.lines:
+            text = self.text_cache.render(self.font, line, True, (255, 255, 255))
+            surface.blit(text, (right - text.get_width(), y))
+            y += text.get_height()
+        if self.show_graph:
+            self.render_graph(surface, pygame.Rect(right - 300, y + 4, 300, 100))
+
+    def render_graph(self, surface : pygame.Surface, area : pygame.Rect):
+        # a bar a frame, split into phases, with a line at the budget - the graph goes up to twice the budget
+        surface.fill((0, 0, 0), area)
+        scale = area.height / (self.budget_ms * 2)
+        frames = list(self.frames)[-area.width:]
+        x = area.right - len(frames)
+        for total, ticks, times in frames:
+            bottom = area.bottom
+            for name in self.phases:
+                height = min(bottom - area.top, round(times.get(name, 0) * scale))
+                if height > 0:
+                    surface.fill(self.colours[name], (x, bottom - height, 1, height))
+                    bottom -= height
+            x += 1
+        budget_y = area.bottom - round(self.budget_ms * scale)
+        pygame.draw.line(surface, (255, 60, 60), (area.left, budget_y), (area.right - 1, budget_y))
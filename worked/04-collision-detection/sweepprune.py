@@ -0,0 +1,97 @@
+from enum import IntEnum
+
+class ContactPhase(IntEnum):
+    BEGIN = 0 # first tick two objects touch
+    PERSIST = 1 # still touching since last tick
+    END = 2 # touched last tick, not any more
+
+class ContactTracker():
+    # remembers which pairs were touching last tick so each contact can be labelled begin / persist / end
+    def __init__(self):
+        self.previous = set()
+        self.current = set()
+
+    def begin_tick(self):
+        self.previous = self.current
+        self.current = set()
+
+    def touch(self, key_1, key_2):
+        pair = (key_1, key_2) if key_1 < key_2 else (key_2, key_1)
+        self.current.add(pair)
+        if pair in self.previous:
+            return ContactPhase.PERSIST
+        return ContactPhase.BEGIN
+
+    def end_tick(self):
+        # pairs which stopped touching this tick
+        return [pair for pair in self.previous if pair not in self.current]
+
+class SweepAndPrune():
+    # keeps every object sorted by its left edge between ticks
+    # objects only move a little each tick, so the order is nearly sorted already and an insertion sort fixes it
+    # in close to linear time, instead of sorting (or checking every pair) from scratch
+    def __init__(self, touching = False):
+        self.touching = touching # count boxes which only share an edge as overlapping
+        self.order = []
+        self.lefts = []
+        self.tracker = ContactTracker()
+
+    def sort(self, boxes : dict):
+        # boxes is key -> (left, top, right, bottom)
+        order = [key for key in self.order if key in boxes]
+        if len(order) != len(boxes):
+            # new objects go on the end, the insertion sort moves them into place
+            known = set(order)
+            order.extend(key for key in boxes if key not in known)
+
+        lefts = [boxes[key][0] for key in order]
+        for i in range(1, len(order)):
+            left = lefts[i]
+            if lefts[i - 1] <= left:
+                continue
+            key = order[i]
+            j = i - 1
+            while j >= 0 and lefts[j] > left:
+                order[j + 1] = order[j]
+                lefts[j + 1] = lefts[j]
+                j -= 1
+            order[j + 1] = key
+            lefts[j + 1] = left
+
+        self.order = order
+        self.lefts = lefts
+
+    def overlapping_pairs(self, boxes : dict):
+        # every pair of keys whose boxes overlap, in sweep order
+        self.sort(boxes)
+        order = self.order
+        lefts = self.lefts
+        touching = self.touching
+        pairs = []
+        count = len(order)
+        for i, key in enumerate(order):
+            _, top, right, bottom = boxes[key]
+            j = i + 1
+            # sorted by left edge, so once one starts past our right edge they all do
+            while j < count and (lefts[j] < right or (touching and lefts[j] == right)):
+                key_2 = order[j]
+                _, top_2, _, bottom_2 = boxes[key_2]
+                if touching:
+                    if top <= bottom_2 and top_2 <= bottom:
+                        pairs.append((key, key_2))
+                elif top < bottom_2 and top_2 < bottom:
+                    pairs.append((key, key_2))
+                j += 1
+        return pairs
+
+    def update(self, boxes : dict):
+        # returns (begin, persist, end) lists of pairs for this tick
+        begin = []
+        persist = []
+        self.tracker.begin_tick()
+        for key, key_2 in self.overlapping_pairs(boxes):
+            if self.tracker.touch(key, key_2) == ContactPhase.BEGIN:
+                begin.append((key, key_2))
+            else:
+                persist.append((key, key_2))
+        return begin, persist, self.tracker.end_tick()
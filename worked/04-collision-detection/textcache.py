@@ -0,0 +1,31 @@
+import pygame
+from collections import OrderedDict
+
+class TextCache():
+    # font.render is slow, and most text on screen is the same from one frame to the next
+    # keeps the surfaces from recent calls keyed by (font, text, antialias, colour), dropping the least recently used
+    # the surfaces are shared, so copy one before changing it (e.g. set_alpha)
+    def __init__(self, max_entries = 256):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font : pygame.font.Font, text : str, antialias : bool, colour):
+        # same arguments as font.render
+        key = (font, text, antialias, tuple(colour))
+        surface = self.surfaces.get(key)
+        if surface != None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, colour)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
@@ -0,0 +1,138 @@
+import numpy as np
+
+# the same simulation as naive_update in main.py, but with every object's data in flat arrays
+# instead of one GameObject (and one Rect) per ball, so a whole tick is a handful of numpy calls
+# blocks are just objects with a speed of 0
+
+# same cell plus the 4 "forward" neighbours, so each pair of cells is only looked at once
+neighbour_offsets = [(1, -1), (1, 0), (1, 1), (0, 1)]
+max_candidates = 1 << 22 # limit on how many candidate pairs get expanded at once, keeps memory flat
+
+def expand_ranges(starts : np.ndarray, ends : np.ndarray):
+    # for ranges [start, end) return (which range, value) for every value in every range
+    counts = ends - starts
+    total = int(counts.sum())
+    owners = np.repeat(np.arange(len(starts), dtype=np.int64), counts)
+    offsets = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, np.repeat(starts, counts) + offsets
+
+class BallArrays():
+    def __init__(self, positions, speeds, sizes, width : int, height : int):
+        self.positions = np.ascontiguousarray(positions, dtype=np.int64).reshape(-1, 2)
+        self.speeds = np.ascontiguousarray(speeds, dtype=np.int64).reshape(-1, 2)
+        self.sizes = np.ascontiguousarray(sizes, dtype=np.int64).reshape(-1, 2)
+        self.width = width
+        self.height = height
+        # cells at least as big as the biggest object means overlapping objects are always in neighbouring cells
+        if len(self.sizes) > 0:
+            self.cell_size = (max(1, int(self.sizes[:, 0].max())), max(1, int(self.sizes[:, 1].max())))
+        else:
+            self.cell_size = (1, 1)
+
+    @classmethod
+    def from_objects(cls, objects, width : int, height : int):
+        positions = [(obj.rect.left, obj.rect.top) for obj in objects]
+        speeds = [(obj.speed[0], obj.speed[1]) for obj in objects]
+        sizes = [(obj.rect.width, obj.rect.height) for obj in objects]
+        return cls(positions, speeds, sizes, width, height)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def write_back(self, objects):
+        # copy the array state back into the GameObjects, e.g. to switch back to another update method
+        for obj, position, speed in zip(objects, self.positions.tolist(), self.speeds.tolist()):
+            obj.rect.topleft = position
+            obj.speed[0] = speed[0]
+            obj.speed[1] = speed[1]
+
+    def find_overlaps(self):
+        # returns two arrays (i, j) of every pair of overlapping objects, overlap meaning the same as Rect.colliderect
+        count = len(self.positions)
+        if count < 2:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+
+        cell_w, cell_h = self.cell_size
+        cells_x = self.width // cell_w + 1
+        cells_y = self.height // cell_h + 1
+        # anything out of bounds gets clamped into the edge cells, which is still correct, just slower
+        cell_x = np.clip(self.positions[:, 0] // cell_w, 0, cells_x - 1)
+        cell_y = np.clip(self.positions[:, 1] // cell_h, 0, cells_y - 1)
+        keys = cell_x * cells_y + cell_y
+
+        order = np.argsort(keys, kind="stable")
+        sorted_x = cell_x[order]
+        sorted_y = cell_y[order]
+        # where each cell's objects start in the sorted order, so a cell's contents is cell_starts[key]:cell_starts[key + 1]
+        cell_starts = np.zeros(cells_x * cells_y + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=cells_x * cells_y), out=cell_starts[1:])
+        # work in sorted order so the gathers below read mostly neighbouring memory
+        sorted_positions = self.positions[order]
+        sorted_sizes = self.sizes[order]
+
+        found_i = []
+        found_j = []
+
+        # same cell: everything after this object in the sorted order
+        sorted_keys = keys[order]
+        starts = np.arange(1, count + 1, dtype=np.int64)
+        ends = cell_starts[sorted_keys + 1]
+        self.collect_overlaps(sorted_positions, sorted_sizes, starts, ends, found_i, found_j)
+
+        for dx, dy in neighbour_offsets:
+            nx = sorted_x + dx
+            ny = sorted_y + dy
+            valid = (nx < cells_x) & (ny >= 0) & (ny < cells_y)
+            neighbour_keys = np.where(valid, nx * cells_y + ny, 0)
+            starts = cell_starts[neighbour_keys]
+            ends = np.where(valid, cell_starts[neighbour_keys + 1], starts)
+            self.collect_overlaps(sorted_positions, sorted_sizes, starts, ends, found_i, found_j)
+
+        return order[np.concatenate(found_i)], order[np.concatenate(found_j)]
+
+    def collect_overlaps(self, positions, sizes, starts, ends, found_i, found_j):
+        # expand the candidate ranges in chunks and keep the pairs which really overlap
+        counts = ends - starts
+        totals = np.cumsum(counts)
+        chunk_start = 0
+        while chunk_start < len(starts):
+            base = totals[chunk_start - 1] if chunk_start > 0 else 0
+            chunk_end = int(np.searchsorted(totals, base + max_candidates, side="right"))
+            chunk_end = max(chunk_end, chunk_start + 1)
+
+            i, j = expand_ranges(starts[chunk_start:chunk_end], ends[chunk_start:chunk_end])
+            i += chunk_start
+
+            pos_i = positions[i]
+            pos_j = positions[j]
+            size_i = sizes[i]
+            size_j = sizes[j]
+            overlap = (pos_i[:, 0] < pos_j[:, 0] + size_j[:, 0]) & (pos_j[:, 0] < pos_i[:, 0] + size_i[:, 0])
+            overlap &= (pos_i[:, 1] < pos_j[:, 1] + size_j[:, 1]) & (pos_j[:, 1] < pos_i[:, 1] + size_i[:, 1])
+            found_i.append(i[overlap])
+            found_j.append(j[overlap])
+
+            chunk_start = chunk_end
+
+    def step(self):
+        # ball_collision_handler reverses both objects for every overlapping pair, so only an odd number of hits matters
+        count = len(self.positions)
+        i, j = self.find_overlaps()
+        hits = np.bincount(i, minlength=count) + np.bincount(j, minlength=count)
+        self.speeds[(hits & 1) == 1] *= -1
+
+        # ball_oob_handler, using the position before the move
+        left = self.positions[:, 0]
+        top = self.positions[:, 1]
+        out_x = (left < 0) | (left + self.sizes[:, 0] > self.width)
+        out_y = (top < 0) | (top + self.sizes[:, 1] > self.height)
+        self.speeds[out_x, 0] *= -1
+        self.speeds[out_y, 1] *= -1
+
+        self.positions += self.speeds
+
+    def render_positions(self, frame_lag = 0):
+        if frame_lag == 0:
+            return self.positions
+        return self.positions + self.speeds * frame_lag
@@ -1,6 +1,10 @@
 import pygame, sys, time, random, math
 from pygame.rect import Rect
 from enum import IntEnum
+from quadtree import Quadtree
+from ballarrays import BallArrays
+from sweepprune import SweepAndPrune
+from physicsworker import PhysicsProcess
 pygame.init()
 
 size = width, height = (1280, 960)
@@ -13,6 +17,9 @@ block_sprite = pygame.image.load("assets/block.png").convert_alpha()
 blocks_to_spawn = 20
 balls_to_spawn = 10
 render_objs = True
+update_strategy = "linear_partition" # any key of update_strategies, see update()
+# run the numpy simulation in a worker process instead of update(), the renderer draws its latest finished tick
+use_physics_process = False
 
 game_objects = []
 balls = []
@@ -98,10 +105,22 @@ class StaticPartition():
 
 
 static_partition = StaticPartition(static_partition_scale)
+# balls move every tick so they get their own tree, blocks never move so their tree is built once in setup()
+dynamic_tree = Quadtree(Rect(0, 0, width, height), dynamic_partition_objects)
+static_tree = Quadtree(Rect(0, 0, width, height), dynamic_partition_objects)
+# only used by numpy_update, built in setup() once everything has been spawned
+ball_arrays = None
+# only used with use_physics_process, started in setup()
+physics_process = None
+# keeps its sorted order between ticks, colliderect doesn't count touching edges
+sweep_and_prune = SweepAndPrune(touching=False)
 
 def process_input():
     for event in pygame.event.get():
-        if event.type == pygame.QUIT: sys.exit()
+        if event.type == pygame.QUIT:
+            if physics_process != None:
+                physics_process.stop()
+            sys.exit()
 
 def next_rect(timestep, obj):
     speed = [obj.speed[0] * timestep, obj.speed[1] * timestep]
@@ -177,15 +196,25 @@ def old_skool_update():
         obj.rect = obj.rect.move(this_update)
 
 # function to wrap the cell update in a way that makes more sense
-def update_cell(cell : set, cell_x, cell_y):
+def update_cell(cell : set, cell_x, cell_y, block_tree : Quadtree = None):
     cell_list = list(cell)
     for i, obj_i in enumerate(cell_list):
         handler = ball_collision_handler
         obj = game_objects[obj_i]
+        # if the blocks have their own tree, leave them out of the grid checks completely
+        if block_tree != None and obj.type == OBJECT_TYPE.BLOCK:
+            continue
+
         for obj_i2 in cell_list[i+1:]:
             obj_2 = game_objects[obj_i2]
+            if block_tree != None and obj_2.type == OBJECT_TYPE.BLOCK:
+                continue
             check_collision(obj, obj_2, handler)
 
+        if block_tree != None:
+            for block_i in block_tree.query(obj.rect):
+                check_collision(obj, blocks[block_i], handler)
+
         handler = ball_oob_handler
         check_out_of_bounds(obj, handler)
         
@@ -205,8 +234,60 @@ def linear_partition_update():
         for y, cell in enumerate(col):
             update_cell(cell, x, y)
 
+def quadtree_update():
+    # balls are in a tree which gets updated as they move, blocks are in a separate tree which never changes
+    # unlike the grid, a crowded area just makes the tree deeper there instead of making a cell huge
+    nearby = []
+    for i, obj in enumerate(balls):
+        handler = ball_collision_handler
+
+        # only check balls after this one, same as the other update methods
+        nearby.clear()
+        for obj_i2 in dynamic_tree.query(obj.rect, nearby):
+            if obj_i2 > i:
+                check_collision(obj, balls[obj_i2], handler)
+
+        nearby.clear()
+        for block_i in static_tree.query(obj.rect, nearby):
+            check_collision(obj, blocks[block_i], handler)
+
+        handler = ball_oob_handler
+        check_out_of_bounds(obj, handler)
+
+        this_update = (obj.speed[0], obj.speed[1])
+        obj.rect = obj.rect.move(this_update)
+        dynamic_tree.move(i, obj.rect)
+
+def combined_update():
+    # the grid for the balls, but blocks only ever come from the static tree
+    for x, col in enumerate(static_partition.cells):
+        for y, cell in enumerate(col):
+            update_cell(cell, x, y, static_tree)
+
+def numpy_update():
+    # every object's position, speed and size lives in numpy arrays instead of GameObjects
+    # gives the same results as naive_update, but does the whole tick as batch operations
+    ball_arrays.step()
+
+def sweep_and_prune_update():
+    boxes = {}
+    for i, obj in enumerate(game_objects):
+        rect = obj.rect
+        boxes[i] = (rect.left, rect.top, rect.right, rect.bottom)
+
+    # only bounce when two objects first touch - the other methods bounce again every tick they're still overlapping
+    begin, persist, end = sweep_and_prune.update(boxes)
+    for i, i2 in begin:
+        ball_collision_handler(game_objects[i], game_objects[i2], {})
+
+    handler = ball_oob_handler
+    for obj in balls:
+        check_out_of_bounds(obj, handler)
+        this_update = (obj.speed[0], obj.speed[1])
+        obj.rect = obj.rect.move(this_update)
+
 def update():
-    # swap this out for different methods
+    # swap this out for different methods by setting update_strategy
     # 1: naive collision - check everything against everything else
     # gets exponentially worse the more things there are in game
     # can check by increasing blocks or balls easily
@@ -217,12 +298,35 @@ def update():
     # both are rendering similar pixel amounts but 500 ball example is far slower
     # old_skool_update()
     # 3: linear spatial partition (grid system)
-    linear_partition_update()
+    # linear_partition_update()
     # 4: dynamic spatial partition (quadtree)
+    # quadtree_update()
     # 5: combined system (blocks in a quadtree)
-    pass
+    # balls stay in the grid but blocks are checked through a tree which never changes
+    # combined_update()
+    # 6: structure of arrays (numpy) - the naive rules, but vectorised
+    # numpy_update()
+    # 7: sort and sweep - sorted order is kept between ticks, so it's nearly linear when things move slowly
+    # sweep_and_prune_update()
+    # 8: set use_physics_process - the numpy version, but in another process so it doesn't wait for rendering
+    if physics_process != None:
+        # it updates itself
+        return
+    update_strategies[update_strategy]()
+
+update_strategies = {
+    "naive": naive_update,
+    "old_skool": old_skool_update,
+    "linear_partition": linear_partition_update,
+    "quadtree": quadtree_update,
+    "combined": combined_update,
+    "numpy": numpy_update,
+    "sweep_and_prune": sweep_and_prune_update
+}
 
 def setup():
+    global ball_arrays
+    global physics_process
 
     for i in range(blocks_to_spawn):
         new_rect = Rect(random.randint(50, width - 50), random.randint(50, height - 50), 0, 0)
@@ -239,6 +343,7 @@ def setup():
         game_objects.append(new_obj)
         blocks.append(new_obj)
         static_partition.add_object(new_obj, len(game_objects) - 1)
+        static_tree.insert(len(blocks) - 1, new_obj.rect)
 
     for i in range(balls_to_spawn):   
         new_rect = Rect(random.randint(50, width - 50), random.randint(50, height - 50), 0, 0)
@@ -257,6 +362,12 @@ def setup():
         game_objects.append(new_obj)
         balls.append(new_obj)
         static_partition.add_object(new_obj, len(game_objects) - 1)
+        dynamic_tree.insert(len(balls) - 1, new_obj.rect)
+
+    ball_arrays = BallArrays.from_objects(game_objects, width, height)
+    if use_physics_process:
+        physics_process = PhysicsProcess(ball_arrays, seconds_per_frame)
+        physics_process.start()
         
 def render(frame_lag = 0):
 
@@ -272,19 +383,30 @@ def render(frame_lag = 0):
         frames = 0
         prev_render = time.time()
 
-    for obj in game_objects:
-        render_position = ( 
-            obj.rect[0] + (obj.speed[0] * frame_lag),
-            obj.rect[1] + (obj.speed[1] * frame_lag)
-        )
-
-        if obj.type == OBJECT_TYPE.BALL:
-            sprite = ball_sprite
-        elif obj.type == OBJECT_TYPE.BLOCK:
-            sprite = block_sprite
-
+    if physics_process != None:
+        # positions from the worker's latest tick, moved on by however long ago that was
+        if render_objs:
+            render_positions = physics_process.render_positions().tolist()
+            screen.blits(zip([obj.sprite for obj in game_objects], render_positions), False)
+    elif update_strategy == "numpy":
+        # the GameObjects don't move in this mode, so draw straight from the arrays
         if render_objs:
-            screen.blit(sprite, render_position)
+            render_positions = ball_arrays.render_positions(frame_lag).tolist()
+            screen.blits(zip([obj.sprite for obj in game_objects], render_positions), False)
+    else:
+        for obj in game_objects:
+            render_position = ( 
+                obj.rect[0] + (obj.speed[0] * frame_lag),
+                obj.rect[1] + (obj.speed[1] * frame_lag)
+            )
+
+            if obj.type == OBJECT_TYPE.BALL:
+                sprite = ball_sprite
+            elif obj.type == OBJECT_TYPE.BLOCK:
+                sprite = block_sprite
+
+            if render_objs:
+                screen.blit(sprite, render_position)
 
     font_surface = font.render(f"FPS: {str(prev_frames)}", True, (255,255,255))
     screen.blit(font_surface, ( width - (width / 5), 20 ))
@@ -0,0 +1,132 @@
+import atexit, time
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from ballarrays import BallArrays
+
+# runs BallArrays.step in another process, so the simulation and the blits each get a core to themselves
+# positions and speeds live in shared memory twice over: the worker writes a tick into whichever copy the renderer
+# isn't meant to be reading, then flips `published` over to it
+# each copy has a sequence number which is odd while it's being written, so if the renderer is ever slow enough for
+# the worker to lap it, it notices and reads again rather than drawing half of one tick and half of another
+
+# control block, one int64 each
+PUBLISHED = 0 # which copy holds the latest finished tick
+STOP = 1
+SEQUENCE = 2 # + copy, odd while that copy is being written
+TICKS = 4 # + copy, which tick that copy holds
+TICK_TIME = 6 # + copy, perf_counter_ns when that tick finished
+control_size = 8
+
+def state_views(buffer, count):
+    # [copy][0] is positions, [copy][1] is speeds, each count x 2
+    return np.ndarray((2, 2, count, 2), dtype=np.int64, buffer=buffer)
+
+def run(state_name, control_name, count, sizes, width, height, tick_ns):
+    state_memory = shared_memory.SharedMemory(name=state_name)
+    control_memory = shared_memory.SharedMemory(name=control_name)
+    state = state_views(state_memory.buf, count)
+    control = np.ndarray(control_size, dtype=np.int64, buffer=control_memory.buf)
+
+    published = int(control[PUBLISHED])
+    # the worker steps its own arrays, the shared copies are only written once a tick is finished
+    arrays = BallArrays(state[published][0].copy(), state[published][1].copy(), sizes, width, height)
+    ticks = int(control[TICKS + published])
+    next_tick = time.perf_counter_ns() + tick_ns
+    while control[STOP] == 0:
+        arrays.step()
+        ticks += 1
+
+        back = 1 - published
+        control[SEQUENCE + back] += 1
+        state[back][0][:] = arrays.positions
+        state[back][1][:] = arrays.speeds
+        control[TICKS + back] = ticks
+        control[TICK_TIME + back] = time.perf_counter_ns()
+        control[SEQUENCE + back] += 1
+        control[PUBLISHED] = back
+        published = back
+
+        # fixed timestep, if a tick runs long the next one starts straight away but the lost time isn't made up
+        sleep_ns = next_tick - time.perf_counter_ns()
+        if sleep_ns > 0:
+            time.sleep(sleep_ns / 1_000_000_000)
+            next_tick += tick_ns
+        else:
+            next_tick = time.perf_counter_ns() + tick_ns
+
+    del state, control
+    state_memory.close()
+    control_memory.close()
+
+class PhysicsProcess():
+    # owns the shared memory and the worker, the renderer calls render_positions() for the latest tick
+    def __init__(self, arrays : BallArrays, tick_time):
+        self.count = len(arrays)
+        self.tick_ns = round(tick_time * 1_000_000_000)
+        self.state_memory = shared_memory.SharedMemory(create=True, size=max(1, 2 * 2 * self.count * 2 * 8))
+        self.control_memory = shared_memory.SharedMemory(create=True, size=control_size * 8)
+        self.state = state_views(self.state_memory.buf, self.count)
+        self.control = np.ndarray(control_size, dtype=np.int64, buffer=self.control_memory.buf)
+        self.control[:] = 0
+        self.state[0][0][:] = arrays.positions
+        self.state[0][1][:] = arrays.speeds
+        self.control[TICK_TIME] = time.perf_counter_ns()
+        # what the renderer last read, its own copy so the worker can carry on writing
+        self.positions = arrays.positions.copy()
+        self.speeds = arrays.speeds.copy()
+        self.ticks = 0
+        self.tick_time = int(self.control[TICK_TIME])
+        self.retries = 0
+        # forked where possible, spawning would import main.py again (and open another window) in the worker
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+        self.process = context.Process(target=run, args=(self.state_memory.name, self.control_memory.name, self.count, arrays.sizes, arrays.width, arrays.height, self.tick_ns), daemon=True)
+
+    def start(self):
+        self.process.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        if self.process == None:
+            return
+        self.control[STOP] = 1
+        if self.process.is_alive():
+            self.process.join(1)
+        if self.process.is_alive():
+            # stuck in a tick (or never saw STOP), it has to be gone before the memory under it is freed
+            self.process.terminate()
+            self.process.join()
+        self.process = None
+        del self.state, self.control
+        self.state_memory.close()
+        self.state_memory.unlink()
+        self.control_memory.close()
+        self.control_memory.unlink()
+        atexit.unregister(self.stop)
+
+    def read(self):
+        # copy the latest finished tick, returns how many ticks the worker has done
+        control = self.control
+        while True:
+            published = int(control[PUBLISHED])
+            sequence = int(control[SEQUENCE + published])
+            if sequence & 1:
+                # only happens if the worker has lapped us, go round for the other copy
+                self.retries += 1
+                continue
+            self.positions[:] = self.state[published][0]
+            self.speeds[:] = self.state[published][1]
+            ticks = int(control[TICKS + published])
+            tick_time = int(control[TICK_TIME + published])
+            if int(control[SEQUENCE + published]) == sequence:
+                break
+            self.retries += 1
+        self.ticks = ticks
+        self.tick_time = tick_time
+        return ticks
+
+    def render_positions(self):
+        # like BallArrays.render_positions, with frame_lag from how long ago the tick finished
+        self.read()
+        frame_lag = min(1.0, (time.perf_counter_ns() - self.tick_time) / self.tick_ns)
+        return self.positions + self.speeds * frame_lag
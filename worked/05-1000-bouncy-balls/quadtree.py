@@ -0,0 +1,123 @@
+from pygame.rect import Rect
+
+class QuadtreeNode():
+    def __init__(self, bounds : Rect, depth : int, parent = None):
+        self.bounds = bounds
+        self.depth = depth
+        self.parent = parent
+        self.items = {} # item -> rect, only the items which don't fit entirely inside a child
+        self.children = None
+
+    def child_for(self, rect : Rect):
+        # the child which completely contains rect, if there is one
+        if self.children == None:
+            return None
+        for child in self.children:
+            if child.bounds.contains(rect):
+                return child
+        return None
+
+class Quadtree():
+    def __init__(self, bounds : Rect, capacity = 2, max_depth = 8):
+        self.root = QuadtreeNode(Rect(bounds), 0)
+        self.capacity = capacity
+        self.max_depth = max_depth
+        self.locations = {} # item -> node holding it, so removal doesn't need a search
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __contains__(self, item):
+        return item in self.locations
+
+    def insert(self, item, rect : Rect):
+        node = self.root
+        child = node.child_for(rect)
+        while child != None:
+            node = child
+            child = node.child_for(rect)
+
+        # anything outside the tree's bounds just lives in the root
+        node.items[item] = Rect(rect)
+        self.locations[item] = node
+
+        if node.children == None and len(node.items) > self.capacity and node.depth < self.max_depth:
+            self.split(node)
+
+    def remove(self, item):
+        node = self.locations.pop(item)
+        del node.items[item]
+        self.collapse(node)
+
+    def move(self, item, rect : Rect):
+        node = self.locations[item]
+        fits = node.bounds.contains(rect) or node.parent == None
+        if fits and node.child_for(rect) == None:
+            # still belongs in the same node, no need to touch the tree structure
+            node.items[item].update(rect)
+            return
+        self.remove(item)
+        self.insert(item, rect)
+
+    def query(self, rect : Rect, found = None):
+        # every item whose rect overlaps the given rect
+        if found == None:
+            found = []
+        to_visit = [self.root]
+        while len(to_visit) > 0:
+            node = to_visit.pop()
+            for item, item_rect in node.items.items():
+                if item_rect.colliderect(rect):
+                    found.append(item)
+            if node.children == None:
+                continue
+            for child in node.children:
+                if child.bounds.colliderect(rect):
+                    to_visit.append(child)
+        return found
+
+    def split(self, node : QuadtreeNode):
+        b = node.bounds
+        half_w = b.width // 2
+        half_h = b.height // 2
+        depth = node.depth + 1
+        node.children = [
+            QuadtreeNode(Rect(b.left, b.top, half_w, half_h), depth, node),
+            QuadtreeNode(Rect(b.left + half_w, b.top, b.width - half_w, half_h), depth, node),
+            QuadtreeNode(Rect(b.left, b.top + half_h, half_w, b.height - half_h), depth, node),
+            QuadtreeNode(Rect(b.left + half_w, b.top + half_h, b.width - half_w, b.height - half_h), depth, node)
+        ]
+
+        # push down everything which now fits inside one of the children
+        items = node.items
+        node.items = {}
+        for item, rect in items.items():
+            child = node.child_for(rect)
+            if child == None:
+                child = node
+            child.items[item] = rect
+            self.locations[item] = child
+
+        for child in node.children:
+            if len(child.items) > self.capacity and child.depth < self.max_depth:
+                self.split(child)
+
+    def collapse(self, node : QuadtreeNode):
+        # merge children back into their parent once they hold few enough items between them
+        while node != None:
+            if node.children == None:
+                node = node.parent
+                continue
+            total = len(node.items)
+            for child in node.children:
+                if child.children != None:
+                    return
+                total += len(child.items)
+            if total > self.capacity:
+                return
+            for child in node.children:
+                for item, rect in child.items.items():
+                    node.items[item] = rect
+                    self.locations[item] = node
+            node.children = None
+            node = node.parent
@@ -0,0 +1,205 @@
+import pygame, sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# a map split into square chunks of tiles, one file per chunk, so only the area around the camera has to be in memory
+# each chunk file uses the same "tile x y width height" lines as the map file, with positions relative to the chunk
+# a chunk file which doesn't exist is just an empty chunk
+#
+# make one from a normal map file with:
+#   python chunkmap.py assets/map assets/map.chunks 16
+
+def chunk_file(chunk_dir : Path, chunk_x : int, chunk_y : int):
+    return Path(chunk_dir) / f"{chunk_x}_{chunk_y}"
+
+def read_chunk_size(chunk_dir : Path):
+    with open(Path(chunk_dir) / "meta", "r") as f:
+        for line in f:
+            split = line.split()
+            if len(split) == 2 and split[0] == "chunk_size":
+                return int(split[1])
+    raise ValueError(f"No chunk_size in {chunk_dir}")
+
+def write_chunks(runs, chunk_dir : Path, chunk_size : int):
+    # runs are (tile, x, y, width, height), split every one at the chunk boundaries it crosses
+    chunks = {}
+    for tile, left, top, run_width, run_height in runs:
+        right = left + run_width
+        bottom = top + run_height
+        for chunk_x in range(left // chunk_size, (right - 1) // chunk_size + 1):
+            for chunk_y in range(top // chunk_size, (bottom - 1) // chunk_size + 1):
+                chunk_left = chunk_x * chunk_size
+                chunk_top = chunk_y * chunk_size
+                run_left = max(left, chunk_left)
+                run_top = max(top, chunk_top)
+                run_right = min(right, chunk_left + chunk_size)
+                run_bottom = min(bottom, chunk_top + chunk_size)
+                line = f"{tile} {run_left - chunk_left} {run_top - chunk_top} {run_right - run_left} {run_bottom - run_top}\n"
+                chunks.setdefault((chunk_x, chunk_y), []).append(line)
+
+    chunk_dir = Path(chunk_dir)
+    chunk_dir.mkdir(parents=True, exist_ok=True)
+    # chunks left over from an older map would otherwise still be read, rather than being empty
+    for path in chunk_dir.glob("*_*"):
+        if path.is_file() and path.name.replace("-", "").replace("_", "").isdigit():
+            path.unlink()
+    for (chunk_x, chunk_y), lines in chunks.items():
+        with open(chunk_file(chunk_dir, chunk_x, chunk_y), "w") as f:
+            f.writelines(lines)
+    # meta goes last, so if writing is interrupted the folder still looks stale
+    with open(chunk_dir / "meta", "w") as f:
+        f.write(f"chunk_size {chunk_size}\n")
+
+def chunks_stale(chunk_dir : Path, map_file : Path, chunk_size : int):
+    # true if the chunks are missing, older than the map file they came from or a different size
+    meta = Path(chunk_dir) / "meta"
+    if not meta.exists() or meta.stat().st_mtime < Path(map_file).stat().st_mtime:
+        return True
+    return read_chunk_size(chunk_dir) != chunk_size
+
+def read_chunk(path : Path):
+    # runs on the loader thread, so only plain python data in here - no pygame surfaces
+    tile_data = []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                split = line.split()
+                if len(split) != 5:
+                    continue
+                tile_data.append({"tile": split[0], "pos": (int(split[1]), int(split[2])), "size": (int(split[3]), int(split[4]))})
+    except FileNotFoundError:
+        pass
+    return tile_data
+
+class StreamedMap:
+    # drop-in for Map which keeps only the chunks near the camera loaded
+    # chunks within `margin` chunks of the view are requested early from a background thread, so by the time
+    # the camera crosses into them they're usually already there, and the least recently used chunks get dropped
+    # once more than max_chunks are loaded
+    def __init__(self, tileset, grid_scale, chunk_dir : Path, max_chunks = 64, margin = 1):
+        self.tileset = tileset
+        self.grid_scale = grid_scale
+        self.chunk_dir = Path(chunk_dir)
+        self.chunk_size = read_chunk_size(self.chunk_dir)
+        self.max_chunks = max_chunks
+        self.margin = margin
+        self.camera = pygame.Rect(0, 0, 0, 0)
+        self.resident = OrderedDict() # (chunk x, chunk y) -> {"tile_data": [...], "surface": baked surface or None}, oldest first
+        self.pending = {} # (chunk x, chunk y) -> Future
+        self.baked_from = None
+        self.loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chunk-loader")
+
+    def chunk_pixels(self):
+        return (self.chunk_size * self.grid_scale[0], self.chunk_size * self.grid_scale[1])
+
+    def chunks_in(self, area : pygame.Rect, margin = 0):
+        chunk_w, chunk_h = self.chunk_pixels()
+        chunks = []
+        for chunk_x in range(area.left // chunk_w - margin, (area.right - 1) // chunk_w + 1 + margin):
+            for chunk_y in range(area.top // chunk_h - margin, (area.bottom - 1) // chunk_h + 1 + margin):
+                chunks.append((chunk_x, chunk_y))
+        return chunks
+
+    def update(self, camera : pygame.Rect):
+        # call once a frame with the area of the world on screen
+        # returns True if what's on screen changed (the camera moved or a visible chunk arrived)
+        changed = camera != self.camera
+        self.camera = pygame.Rect(camera)
+        visible = set(self.chunks_in(camera))
+        wanted = self.chunks_in(camera, self.margin)
+        wanted_set = set(wanted)
+
+        # pick up anything the loader has finished
+        for key, future in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[key]
+            if future.cancelled():
+                continue
+            self.resident[key] = {"tile_data": future.result(), "surface": None}
+            if key in visible:
+                changed = True
+
+        # don't bother loading chunks we've moved away from
+        for key, future in list(self.pending.items()):
+            if key not in wanted_set and future.cancel():
+                del self.pending[key]
+
+        for key in wanted:
+            if key in self.resident:
+                self.resident.move_to_end(key)
+            elif key not in self.pending:
+                self.pending[key] = self.loader.submit(read_chunk, chunk_file(self.chunk_dir, key[0], key[1]))
+
+        # evict least recently used, but never something we still want
+        while len(self.resident) > self.max_chunks:
+            oldest = next(iter(self.resident))
+            if oldest in wanted_set:
+                break
+            del self.resident[oldest]
+
+        return changed
+
+    def wait(self):
+        # block until every requested chunk is loaded, e.g. before the first frame
+        for future in list(self.pending.values()):
+            if not future.cancelled():
+                future.result()
+        self.update(self.camera)
+
+    def bake(self, tile_manager, key):
+        # same as Map.bake but for a single chunk, happens on the main thread the first time a chunk is drawn
+        # tiles bigger than the grid get cut off at the edge of their chunk
+        chunk = self.resident[key]
+        chunk_w, chunk_h = self.chunk_pixels()
+        surface = pygame.Surface((chunk_w, chunk_h), pygame.SRCALPHA).convert_alpha()
+        tiles = tile_manager.tile_sets[self.tileset]["tile_data"]
+        for r in chunk["tile_data"]:
+            sprite = tiles[r["tile"]]["surface"]
+            for x in range(r["size"][0]):
+                for y in range(r["size"][1]):
+                    surface.blit(sprite, ((r["pos"][0] + x) * self.grid_scale[0], (r["pos"][1] + y) * self.grid_scale[1]))
+        chunk["surface"] = surface
+        return surface
+
+    def render(self, tile_manager, surface : pygame.Surface = None):
+        # anything not loaded yet is just left out, rather than stalling the frame
+        if surface == None:
+            surface = pygame.display.get_surface()
+        sprite = tile_manager.tile_sets[self.tileset]["sprite"]
+        if self.baked_from != (sprite, self.grid_scale):
+            for chunk in self.resident.values():
+                chunk["surface"] = None
+            self.baked_from = (sprite, self.grid_scale)
+
+        chunk_w, chunk_h = self.chunk_pixels()
+        baked_this_frame = False
+        for key in self.chunks_in(self.camera):
+            chunk = self.resident.get(key)
+            if chunk == None or len(chunk["tile_data"]) == 0:
+                continue
+            baked = chunk["surface"]
+            if baked == None:
+                baked = self.bake(tile_manager, key)
+                baked_this_frame = True
+            surface.blit(baked, (key[0] * chunk_w - self.camera.left, key[1] * chunk_h - self.camera.top))
+
+        # on quiet frames, get one of the chunks just off screen ready so crossing into it doesn't cost a bake
+        if not baked_this_frame:
+            for key in self.chunks_in(self.camera, self.margin):
+                chunk = self.resident.get(key)
+                if chunk != None and chunk["surface"] == None and len(chunk["tile_data"]) > 0:
+                    self.bake(tile_manager, key)
+                    break
+
+    def close(self):
+        self.loader.shutdown(wait=False, cancel_futures=True)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("usage: python chunkmap.py <map file> <output folder> <chunk size in tiles>")
+        sys.exit(1)
+    # a whole map file reads just like one big chunk
+    runs = [(r["tile"], r["pos"][0], r["pos"][1], r["size"][0], r["size"][1]) for r in read_chunk(Path(sys.argv[1]))]
+    write_chunks(runs, Path(sys.argv[2]), int(sys.argv[3]))
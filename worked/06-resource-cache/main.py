@@ -1,19 +1,47 @@
-import pygame, time, sys
+import pygame, sys
 from pathlib import Path
+from dirtyrect import DirtyRectRenderer
+from chunkmap import StreamedMap, write_chunks, chunks_stale
+from tilebin import PackedAssets, compile_if_stale
+from resourcecache import ResourceCache
+from framepacer import FramePacer
 pygame.init()
 
 size = width, height = (640, 480) # 20 x 15 at 32 x 32 tiles
 black = (0, 0, 0)
 screen = pygame.display.set_mode(size)
 frame_time = 1.0 / 60.0
+pacer = FramePacer(frame_time) # sleeps out the rest of each frame in main()
 do_render = False
+holding_map = False # whether the map has its tileset acquired from the resource cache
 asset_path = Path("./assets/")
+chunk_tiles = 16 # the map is baked into chunks of 16 x 16 tiles
+# nothing moves, so the screen only needs drawing again when tiles are loaded or unloaded
+use_dirty_rects = True
+renderer = DirtyRectRenderer(screen, black)
+# load the map in chunks around the camera on a background thread, instead of all at once (arrow keys move the camera)
+use_streamed_map = False
+camera = pygame.Rect(0, 0, width, height)
+camera_moves = {"left": (-32, 0), "right": (32, 0), "up": (0, -32), "down": (0, 32)}
+# load the tilesets and map from a binary file compiled from the text ones, see tilebin.py
+use_packed_assets = True
+packed_file = asset_path / "assets.bin"
+# load and unload tilesets through a reference counted cache, so keys 1 and 2 only let go of the map's tileset and
+# it stays loaded until the decoded sprites go over the budget (4 prints what's resident)
+use_resource_cache = False
+resource_budget = 16 * 1024 * 1024
 
 class TileManager:
-    def __init__(self, meta_index):
+    def __init__(self, meta_index, packed : PackedAssets = None):
         # includes only name and filename of index {"dungeon": "index"}
         self.run_level = 0
-        self.tile_sets = self.load_index(meta_index)
+        self.packed = packed
+        if packed != None:
+            self.tile_sets = {}
+            for name, info in packed.tilesets.items():
+                self.tile_sets[name] = {"data_file": info["data_file"], "texture": info["texture"], "tile_data": {}, "run_level": 1}
+        else:
+            self.tile_sets = self.load_index(meta_index)
         self.run_level = 1
 
     def load_index(self, index):
@@ -21,10 +49,13 @@ class TileManager:
         with open(index, "r") as f:
             for line in f:
                 split = line.split()
-                index_out[split[0]] = {"data_file": split[1], "texture": split[2], "tile_data": {}}
+                index_out[split[0]] = {"data_file": split[1], "texture": split[2], "tile_data": {}, "run_level": 1}
         return index_out
 
     def load_tileset_data(self, name):
+        if self.packed != None:
+            self.load_packed_tileset_data(name)
+            return
         data_file = asset_path / self.tile_sets[name]["data_file"]
         with open(data_file, 'r') as f:
             for line in f:
@@ -35,9 +66,25 @@ class TileManager:
                 # otherwise, store this data as a rect
                 r = [int(x) for x in split[1:5]]
                 self.tile_sets[name]["tile_data"][split[0]] = {"rect": pygame.Rect(r)}
+        self.tile_sets[name]["run_level"] = 2
         self.run_level = 2
         print(f"Loaded data from {name}")
     
+    def load_packed_tileset_data(self, name):
+        # same as load_tileset_data, but the numbers come straight out of the mapped file
+        records = self.packed.tile_records(name)
+        names = self.packed.strings
+        tile_data = self.tile_sets[name]["tile_data"]
+        for i in range(0, len(records), 6):
+            # animations (frames > 0) aren't used in this chapter, same as the text loader skipping them
+            if records[i + 5] != 0:
+                continue
+            tile_data[names[records[i]]] = {"rect": pygame.Rect(records[i + 1], records[i + 2], records[i + 3], records[i + 4])}
+        records.release()
+        self.tile_sets[name]["run_level"] = 2
+        self.run_level = 2
+        print(f"Loaded data from {name}")
+
     def load_tileset_sprite(self, ts, zoom_level = 1):
         # it's already loaded
         if "sprite" in self.tile_sets[ts]:
@@ -50,6 +97,7 @@ class TileManager:
             r : pygame.Rect = tile["rect"]
             scaled_rect = pygame.Rect(r.left * zoom_level, r.top * zoom_level, r.width * zoom_level, r.height * zoom_level)
             tile["surface"] = tileset_sprite.subsurface(scaled_rect)
+        self.tile_sets[ts]["run_level"] = 3
         self.run_level = 3
         print(f"Loaded sprites from {ts}")
 
@@ -59,21 +107,33 @@ class TileManager:
             del tile["surface"]
         del self.tile_sets[name]["sprite"]
         print(f"Deleted sprites from {name}")
+        self.tile_sets[name]["run_level"] = 2
         self.run_level = 2
 
     def unload_tileset_data(self, name):
         # just wipe everything
         self.tile_sets[name]["tile_data"] = {}
         print(f"Deleted data from {name}")
+        self.tile_sets[name]["run_level"] = 1
         self.run_level = 1
 
+    def tileset_run_level(self, name):
+        # run_level is whatever the last load or unload did to any tileset, this is just the one tileset
+        return self.tile_sets[name]["run_level"]
+
 class Map:
     def __init__(self, tileset, grid_scale):
         self.tileset = tileset
         self.tile_data = []
+        self.packed_runs = None # flat (tile, x, y, width, height) ints when loaded from a packed file
+        self.packed_names = None
         self.grid_scale = grid_scale
+        self.chunks = {} # (chunk x, chunk y) -> surface with all of that chunk's tiles already drawn on it
+        self.baked_from = None # (tileset sprite, grid scale) the chunks were drawn with
 
     def load_data(self, map_file):
+        # the tiles are changing, bake them again next render
+        self.baked_from = None
         with open(asset_path / map_file, "r") as f:
             for line in f:
                 split = line.split()
@@ -81,26 +141,106 @@ class Map:
                     continue
                 self.tile_data.append({"tile": split[0], "pos": (int(split[1]), int(split[2])), "size": (int(split[3]), int(split[4])) })
 
-    def render(self, tile_manager):
+    def load_packed(self, packed : PackedAssets):
+        # keeps a view into the mapped file instead of a dict per run
+        self.baked_from = None
+        self.packed_runs = packed.runs
+        self.packed_names = packed.strings
+
+    def runs(self):
+        # (tile, x, y, width, height) for every run of tiles, whichever way the map was loaded
         for r in self.tile_data:
-            start_x = r["pos"][0] * self.grid_scale[0]
-            start_y = r["pos"][1] * self.grid_scale[1]
-            width = r["size"][0]
-            height = r["size"][1]
-            sprite = tile_manager.tile_sets[self.tileset]["tile_data"][r["tile"]]["surface"]
+            yield r["tile"], r["pos"][0], r["pos"][1], r["size"][0], r["size"][1]
+        if self.packed_runs != None:
+            runs = self.packed_runs
+            names = self.packed_names
+            for i in range(0, len(runs), 5):
+                yield names[runs[i]], runs[i + 1], runs[i + 2], runs[i + 3], runs[i + 4]
+
+    def tiles_used(self):
+        return set(tile for tile, x, y, w, h in self.runs())
+
+    def bake(self, tile_manager):
+        # draw every tile once into the chunk(s) it covers, after this a chunk is a single blit
+        self.chunks = {}
+        chunk_w = chunk_tiles * self.grid_scale[0]
+        chunk_h = chunk_tiles * self.grid_scale[1]
+        for tile, pos_x, pos_y, width, height in self.runs():
+            start_x = pos_x * self.grid_scale[0]
+            start_y = pos_y * self.grid_scale[1]
+            sprite = tile_manager.tile_sets[self.tileset]["tile_data"][tile]["surface"]
+            sprite_w, sprite_h = sprite.get_size()
             for x in range(width):
                 for y in range(height):
-                    screen.blit(sprite, (start_x + (x * self.grid_scale[0]), start_y + (y * self.grid_scale[1])))
+                    tile_x = start_x + (x * self.grid_scale[0])
+                    tile_y = start_y + (y * self.grid_scale[1])
+                    # a tile bigger than the grid can spill over into the next chunk
+                    for chunk_x in range(tile_x // chunk_w, (tile_x + sprite_w - 1) // chunk_w + 1):
+                        for chunk_y in range(tile_y // chunk_h, (tile_y + sprite_h - 1) // chunk_h + 1):
+                            chunk = self.chunks.get((chunk_x, chunk_y))
+                            if chunk == None:
+                                chunk = pygame.Surface((chunk_w, chunk_h), pygame.SRCALPHA).convert_alpha()
+                                self.chunks[(chunk_x, chunk_y)] = chunk
+                            chunk.blit(sprite, (tile_x - chunk_x * chunk_w, tile_y - chunk_y * chunk_h))
+        self.baked_from = (tile_manager.tile_sets[self.tileset]["sprite"], self.grid_scale)
 
-def process_input(manager : TileManager):
+    def render(self, tile_manager, surface : pygame.Surface = None):
+        if surface == None:
+            surface = screen
+        # the chunks only need drawing again if the tiles, the tileset sprite (e.g. a new zoom) or the grid changed
+        baked_from = self.baked_from
+        if baked_from == None or baked_from[0] is not tile_manager.tile_sets[self.tileset]["sprite"] or baked_from[1] != self.grid_scale:
+            self.bake(tile_manager)
+
+        chunk_w = chunk_tiles * self.grid_scale[0]
+        chunk_h = chunk_tiles * self.grid_scale[1]
+        view = surface.get_rect()
+        for chunk_x in range(view.left // chunk_w, (view.right - 1) // chunk_w + 1):
+            for chunk_y in range(view.top // chunk_h, (view.bottom - 1) // chunk_h + 1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk != None:
+                    surface.blit(chunk, (chunk_x * chunk_w, chunk_y * chunk_h))
+
+def cache_input(key_name, cache : ResourceCache, map_tiles):
+    # map_tiles is (tileset, tiles) for the map, acquired while it's being drawn
+    global do_render, holding_map
+    if key_name == "4":
+        report = cache.report()
+        print(f"{report['resident_bytes'] / 1024:.0f} KiB resident of {report['budget_bytes'] / 1024:.0f} KiB, {report['evictions']} evicted")
+        for tileset, info in report["tilesets"].items():
+            print(f"  {tileset}: level {info['run_level']}, {info['refs']} refs, {info['tiles_in_use']} tiles in use, {info['bytes'] / 1024:.0f} KiB")
+        return
+    if key_name == "3":
+        if not holding_map:
+            cache.acquire(*map_tiles)
+            holding_map = True
+        do_render = True
+    else:
+        if holding_map:
+            cache.release(*map_tiles)
+            holding_map = False
+        do_render = False
+    renderer.invalidate()
+
+def process_input(manager : TileManager, cache : ResourceCache = None, map_tiles = None):
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            print(f"Frame pacing: {pacer.stats()}")
             for tileset in manager.tile_sets:
                 manager.unload_tileset_sprite(tileset)
                 manager.unload_tileset_data(tileset)
             sys.exit()
+        elif event.type == pygame.WINDOWEXPOSED or event.type == pygame.VIDEOEXPOSE:
+            # the window was covered, minimised or restored - only the dirty rects would be redrawn otherwise
+            renderer.invalidate()
         elif event.type == pygame.KEYDOWN:
             key_name = pygame.key.name(event.key)
+            if use_streamed_map and key_name in camera_moves:
+                camera.move_ip(camera_moves[key_name])
+                continue
+            if cache != None and key_name in ["1", "2", "3", "4"]:
+                cache_input(key_name, cache, map_tiles)
+                continue
             if key_name not in ["1", "2", "3"]:
                 return
 
@@ -144,29 +284,63 @@ def process_input(manager : TileManager):
             
             global do_render
             do_render = new_render
+            renderer.invalidate()
 
 def render(manager, my_map):
-    screen.fill(black)
-    if do_render:
-        my_map.render(manager)
-    pygame.display.flip()    
+    if use_streamed_map and my_map.update(camera):
+        # the camera moved or a chunk finished loading
+        renderer.invalidate()
+
+    if not use_dirty_rects:
+        screen.fill(black)
+        if do_render:
+            my_map.render(manager)
+        pygame.display.flip()
+        return
+
+    if renderer.full_redraw:
+        background = pygame.Surface(size).convert()
+        background.fill(black)
+        if do_render:
+            my_map.render(manager, background)
+        renderer.background = background
+    # with nothing queued this only does any work after an invalidate()
+    renderer.present()
 
 def main():
-    manager = TileManager(asset_path / "index")
+    packed = None
+    if use_packed_assets:
+        compile_if_stale(asset_path, packed_file)
+        packed = PackedAssets(packed_file)
+
+    manager = TileManager(asset_path / "index", packed)
     # manager.load_tileset_data("dungeon")
     # manager.load_tileset_sprite("dungeon", 2)
 
     my_map = Map("dungeon", (32, 32))
-    my_map.load_data("map")
+    if packed != None:
+        my_map.load_packed(packed)
+    else:
+        my_map.load_data("map")
+
+    cache = None
+    map_tiles = None
+    if use_resource_cache:
+        cache = ResourceCache(manager, resource_budget, 2)
+        map_tiles = (my_map.tileset, my_map.tiles_used())
+
+    if use_streamed_map:
+        chunk_dir = asset_path / "map.chunks"
+        # like compile_if_stale, written again whenever assets/map is newer
+        if chunks_stale(chunk_dir, asset_path / "map", chunk_tiles):
+            write_chunks(my_map.runs(), chunk_dir, chunk_tiles)
+        my_map = StreamedMap("dungeon", (32, 32), chunk_dir)
+        pygame.key.set_repeat(200, 30)
 
     while (True):
-        start = time.time()
-        process_input(manager)
+        process_input(manager, cache, map_tiles)
         render(manager, my_map)
-        sleep_time = start + frame_time - time.time()
-        if sleep_time < 0:
-            sleep_time = 0
-        time.sleep(sleep_time)
+        pacer.wait()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
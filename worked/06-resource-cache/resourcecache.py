@@ -0,0 +1,80 @@
+from collections import Counter, OrderedDict
+
+class ResourceCache():
+    # sits on top of a TileManager and keeps track of who is using what
+    # each map acquires the tilesets (and the tiles in them) it needs and releases them when it's done, and a
+    # tileset is loaded the first time anything acquires it
+    # released tilesets aren't unloaded straight away - another map will probably want them again soon - but once
+    # the decoded sprites add up to more than budget_bytes, the least recently released ones are unloaded first
+    # tilesets something is still holding are never unloaded, so the budget can be exceeded if they need it
+    def __init__(self, manager, budget_bytes = 64 * 1024 * 1024, zoom_level = 2):
+        self.manager = manager
+        self.budget_bytes = budget_bytes
+        self.zoom_level = zoom_level
+        self.refs = Counter() # tileset -> number of holders
+        self.tile_refs = {} # tileset -> Counter of tile name -> number of holders
+        self.unused = OrderedDict() # loaded tilesets nobody holds, least recently released first
+        self.evictions = 0
+
+    def acquire(self, tileset, tiles = ()):
+        if self.manager.tileset_run_level(tileset) < 2:
+            self.manager.load_tileset_data(tileset)
+        if self.manager.tileset_run_level(tileset) < 3:
+            self.manager.load_tileset_sprite(tileset, self.zoom_level)
+        self.refs[tileset] += 1
+        self.tile_refs.setdefault(tileset, Counter()).update(tiles)
+        self.unused.pop(tileset, None)
+        # loading this one might have gone over
+        self.trim()
+
+    def release(self, tileset, tiles = ()):
+        if self.refs[tileset] <= 0:
+            raise ValueError(f"{tileset} released more times than it was acquired")
+        self.refs[tileset] -= 1
+        tile_refs = self.tile_refs[tileset]
+        tile_refs.subtract(tiles)
+        for tile in tiles:
+            if tile_refs[tile] <= 0:
+                del tile_refs[tile]
+        if self.refs[tileset] == 0:
+            del self.refs[tileset]
+            self.unused[tileset] = True
+            self.trim()
+
+    def tileset_bytes(self, tileset):
+        # only the decoded sprite counts, the rects and names are tiny next to it
+        sprite = self.manager.tile_sets[tileset].get("sprite")
+        if sprite == None:
+            return 0
+        return sprite.get_width() * sprite.get_height() * sprite.get_bytesize()
+
+    def resident_bytes(self):
+        return sum(self.tileset_bytes(tileset) for tileset in self.manager.tile_sets)
+
+    def trim(self):
+        resident = self.resident_bytes()
+        while resident > self.budget_bytes and len(self.unused) > 0:
+            tileset, _ = self.unused.popitem(last=False)
+            resident -= self.tileset_bytes(tileset)
+            self.unload(tileset)
+            self.evictions += 1
+
+    def unload(self, tileset):
+        if self.manager.tileset_run_level(tileset) >= 3:
+            self.manager.unload_tileset_sprite(tileset)
+        if self.manager.tileset_run_level(tileset) >= 2:
+            self.manager.unload_tileset_data(tileset)
+
+    def tiles_in_use(self, tileset):
+        return set(self.tile_refs.get(tileset, ()))
+
+    def report(self):
+        tilesets = {}
+        for tileset in self.manager.tile_sets:
+            tilesets[tileset] = {
+                "refs": self.refs[tileset],
+                "tiles_in_use": len(self.tile_refs.get(tileset, ())),
+                "run_level": self.manager.tileset_run_level(tileset),
+                "bytes": self.tileset_bytes(tileset),
+            }
+        return {"resident_bytes": self.resident_bytes(), "budget_bytes": self.budget_bytes, "evictions": self.evictions, "tilesets": tilesets}
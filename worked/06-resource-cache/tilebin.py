@@ -0,0 +1,143 @@
+import mmap, struct, sys
+from pathlib import Path
+
+# compiles the text index, tileset data files and map into one binary file which gets mmap'd at load time
+# all the numbers are little endian int32s which can be read straight out of the mapped file with memoryview.cast,
+# so there is no splitting or int() parsing, and nothing gets copied until it's actually used
+#
+# layout:
+#   header       magic, version, string count, tileset count, tile count, run count, object count
+#   strings      (string count + 1) offsets into the string blob at the end of the file
+#   tilesets     name, data file, texture, first tile, tile count        (string ids and tile indices)
+#   tiles        name, x, y, width, height, frames                        (frames is 0 for a plain tile)
+#   runs         tile name, x, y, width, height                           (the map's runs of tiles)
+#   objects      type, x, y                                               (the map's 3 column lines)
+#   string blob  utf-8
+#
+#   python tilebin.py assets assets/assets.bin
+
+magic = b"T102"
+version = 1
+header_format = "<4s6I"
+tileset_fields = 5
+tile_fields = 6
+run_fields = 5
+object_fields = 3
+
+class StringTable():
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def id(self, string):
+        if string not in self.ids:
+            self.ids[string] = len(self.strings)
+            self.strings.append(string)
+        return self.ids[string]
+
+def compile_assets(asset_dir : Path, out_file : Path, index = "index", map_file = "map"):
+    asset_dir = Path(asset_dir)
+    strings = StringTable()
+    tilesets = []
+    tiles = []
+    runs = []
+    objects = []
+
+    with open(asset_dir / index, "r") as f:
+        for line in f:
+            split = line.split()
+            if len(split) != 3:
+                continue
+            first_tile = len(tiles) // tile_fields
+            with open(asset_dir / split[1], "r") as data:
+                for data_line in data:
+                    data_split = data_line.split()
+                    if len(data_split) != 5 and len(data_split) != 6:
+                        continue
+                    frames = int(data_split[5]) if len(data_split) == 6 else 0
+                    tiles.extend([strings.id(data_split[0])] + [int(x) for x in data_split[1:5]] + [frames])
+            tile_count = len(tiles) // tile_fields - first_tile
+            tilesets.extend([strings.id(split[0]), strings.id(split[1]), strings.id(split[2]), first_tile, tile_count])
+
+    with open(asset_dir / map_file, "r") as f:
+        for line in f:
+            split = line.split()
+            if len(split) == 5:
+                runs.extend([strings.id(split[0])] + [int(x) for x in split[1:5]])
+            elif len(split) == 3:
+                objects.extend([strings.id(split[0]), int(split[1]), int(split[2])])
+
+    encoded = [string.encode("utf-8") for string in strings.strings]
+    offsets = [0]
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+
+    with open(out_file, "wb") as f:
+        f.write(struct.pack(header_format, magic, version, len(strings.strings), len(tilesets) // tileset_fields, len(tiles) // tile_fields, len(runs) // run_fields, len(objects) // object_fields))
+        for section in [offsets, tilesets, tiles, runs, objects]:
+            f.write(struct.pack(f"<{len(section)}i", *section))
+        f.write(b"".join(encoded))
+
+def compile_if_stale(asset_dir : Path, out_file : Path, index = "index", map_file = "map"):
+    # (re)build the binary if it's missing or any of the text files it came from has changed since
+    asset_dir = Path(asset_dir)
+    out_file = Path(out_file)
+    sources = [asset_dir / index, asset_dir / map_file]
+    with open(asset_dir / index, "r") as f:
+        for line in f:
+            split = line.split()
+            if len(split) == 3:
+                sources.append(asset_dir / split[1])
+    if out_file.exists() and out_file.stat().st_mtime >= max(source.stat().st_mtime for source in sources):
+        return
+    compile_assets(asset_dir, out_file, index, map_file)
+
+class PackedAssets():
+    def __init__(self, path : Path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+
+        found_magic, found_version, string_count, tileset_count, tile_count, run_count, object_count = struct.unpack_from(header_format, self.map, 0)
+        if found_magic != magic or found_version != version:
+            raise ValueError(f"{path} is not a version {version} packed asset file")
+
+        offset = struct.calcsize(header_format)
+        offsets, offset = self.int_section(offset, string_count + 1)
+        self.tileset_data, offset = self.int_section(offset, tileset_count * tileset_fields)
+        self.tile_data, offset = self.int_section(offset, tile_count * tile_fields)
+        self.runs, offset = self.int_section(offset, run_count * run_fields)
+        self.objects, offset = self.int_section(offset, object_count * object_fields)
+
+        # names are needed as dict keys anyway, and there are only a few hundred of them
+        blob = self.view[offset:]
+        self.strings = [str(blob[offsets[i]:offsets[i + 1]], "utf-8") for i in range(string_count)]
+
+        self.tilesets = {}
+        for i in range(0, len(self.tileset_data), tileset_fields):
+            name, data_file, texture, first_tile, count = self.tileset_data[i:i + tileset_fields]
+            self.tilesets[self.strings[name]] = {"data_file": self.strings[data_file], "texture": self.strings[texture], "first_tile": first_tile, "tile_count": count}
+
+    def int_section(self, offset : int, count : int):
+        # a view of count int32s straight out of the mapped file, no copy
+        end = offset + count * 4
+        return self.view[offset:end].cast("i"), end
+
+    def tile_records(self, tileset : str):
+        # flat (name, x, y, width, height, frames) ints for every tile in the tileset
+        info = self.tilesets[tileset]
+        start = info["first_tile"] * tile_fields
+        return self.tile_data[start:start + info["tile_count"] * tile_fields]
+
+    def close(self):
+        # anything still holding a view from tile_records() etc. has to let go of it first
+        for view in [self.tileset_data, self.tile_data, self.runs, self.objects, self.view]:
+            view.release()
+        self.map.close()
+        self.file.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python tilebin.py <asset folder> <output file>")
+        sys.exit(1)
+    compile_assets(Path(sys.argv[1]), Path(sys.argv[2]))
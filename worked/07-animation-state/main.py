@@ -1,14 +1,17 @@
-import pygame, time, sys, math
+import pygame, sys, math
 from enum import IntEnum
 from pathlib import Path
+from framepacer import FramePacer
 pygame.init()
 
 size = width, height = (640, 480) # 20 x 15 at 32 x 32 tiles
 black = (0, 0, 0)
 screen = pygame.display.set_mode(size)
 frame_time = 1.0 / 30.0
+pacer = FramePacer(frame_time) # sleeps out the rest of each frame in main()
 do_render = False
 asset_path = Path("./assets/")
+chunk_tiles = 16 # the map is baked into chunks of 16 x 16 tiles
 
 class GameObject:
     animations_dict = {
@@ -25,6 +28,28 @@ class GameObject:
         self.animations = GameObject.animations_dict[obj_type]
         self.cur_animation = 0
         self.animation_speed = animation_speed
+        self.frames = None # a tuple of surfaces for each of animations, see bind_frames
+        self.frames_from = None # the tileset sprite the frames were cut from
+        self.frame = -1 # frame of sprite_animation that sprite is
+        self.sprite_animation = -1
+        self.sprite = None
+
+    def bind_frames(self, animation_frames, sprite_sheet : pygame.Surface):
+        # animation_frames is {animation name: tuple of surfaces} from GraphicsManager.compile_animations
+        self.frames = [animation_frames[name] for name in self.animations]
+        self.frames_from = sprite_sheet
+        self.frame = -1
+
+    def animate(self, cur_frame):
+        # the surface to draw this frame, only looked up again when the frame or animation changes
+        frames = self.frames[self.cur_animation]
+        # loop the animation
+        frame = int(cur_frame * self.animation_speed) % len(frames)
+        if frame != self.frame or self.cur_animation != self.sprite_animation:
+            self.frame = frame
+            self.sprite_animation = self.cur_animation
+            self.sprite = frames[frame]
+        return self.sprite
 
 class GraphicsManager:
     def __init__(self, meta_index):
@@ -88,6 +113,13 @@ class GraphicsManager:
         self.run_level = 3
         print(f"Loaded sprites from {ts}")
 
+    def compile_animations(self, name):
+        # every animation as a tuple of its frames' surfaces, so finding an actor's sprite is indexing instead of
+        # going through animations and tile_data by name
+        tile_set = self.tile_sets[name]
+        tile_data = tile_set["tile_data"]
+        return {animation: tuple(tile_data[tile]["surface"] for tile in tiles) for animation, tiles in tile_set["animations"].items()}
+
     def unload_tileset_sprite(self, name):
         for tile in self.tile_sets[name]["tile_data"].values():
             del tile["surface"]
@@ -108,8 +140,14 @@ class Map:
         self.tile_data = []
         self.objects : list[GameObject] = []
         self.grid_scale = grid_scale
+        self.chunks = {} # (chunk x, chunk y) -> surface with all of that chunk's tiles already drawn on it
+        self.baked_from = None # (tileset sprite, grid scale) the chunks were drawn with
+        self.animation_frames = None # compiled from the tileset, see GraphicsManager.compile_animations
+        self.frames_from = None # the tileset sprite animation_frames was compiled from
 
     def load_data(self, map_file):
+        # the tiles are changing, bake them again next render
+        self.baked_from = None
         with open(asset_path / map_file, "r") as f:
             for line in f:
                 split = line.split()
@@ -126,27 +164,63 @@ class Map:
                 obj.cur_animation += 1
                 obj.cur_animation = obj.cur_animation % len(obj.animations)
 
-    def render(self, tile_manager, cur_frame):
+    def bake(self, tile_manager):
+        # draw every tile once into the chunk(s) it covers, after this a chunk is a single blit
+        self.chunks = {}
+        chunk_w = chunk_tiles * self.grid_scale[0]
+        chunk_h = chunk_tiles * self.grid_scale[1]
         for r in self.tile_data:
             start_x = r["pos"][0] * self.grid_scale[0]
             start_y = r["pos"][1] * self.grid_scale[1]
             width = r["size"][0]
             height = r["size"][1]
             sprite = tile_manager.tile_sets[self.tileset]["tile_data"][r["tile"]]["surface"]
+            sprite_w, sprite_h = sprite.get_size()
             for x in range(width):
                 for y in range(height):
-                    screen.blit(sprite, (start_x + (x * self.grid_scale[0]), start_y + (y * self.grid_scale[1])))
+                    tile_x = start_x + (x * self.grid_scale[0])
+                    tile_y = start_y + (y * self.grid_scale[1])
+                    # a tile bigger than the grid can spill over into the next chunk
+                    for chunk_x in range(tile_x // chunk_w, (tile_x + sprite_w - 1) // chunk_w + 1):
+                        for chunk_y in range(tile_y // chunk_h, (tile_y + sprite_h - 1) // chunk_h + 1):
+                            chunk = self.chunks.get((chunk_x, chunk_y))
+                            if chunk == None:
+                                chunk = pygame.Surface((chunk_w, chunk_h), pygame.SRCALPHA).convert_alpha()
+                                self.chunks[(chunk_x, chunk_y)] = chunk
+                            chunk.blit(sprite, (tile_x - chunk_x * chunk_w, tile_y - chunk_y * chunk_h))
+        self.baked_from = (tile_manager.tile_sets[self.tileset]["sprite"], self.grid_scale)
+
+    def render(self, tile_manager, cur_frame):
+        self.render_tiles(tile_manager, screen)
+        # the frames only need compiling again when the tileset's sprite is loaded again
+        sprite_sheet = tile_manager.tile_sets[self.tileset]["sprite"]
+        if self.frames_from is not sprite_sheet:
+            self.animation_frames = tile_manager.compile_animations(self.tileset)
+            self.frames_from = sprite_sheet
         for obj in self.objects:
-            cur_animation_frames = tile_manager.tile_sets[self.tileset]["animations"][obj.animations[obj.cur_animation]]
-            # loop the animation
-            cur_frame_tile = cur_animation_frames[math.floor(cur_frame * obj.animation_speed) % len(cur_animation_frames)]
-            # get the actual sprite for the animation
-            sprite = tile_manager.tile_sets[self.tileset]["tile_data"][cur_frame_tile]["surface"]
-            screen.blit(sprite, obj.rect)
+            if obj.frames_from is not sprite_sheet:
+                obj.bind_frames(self.animation_frames, sprite_sheet)
+            screen.blit(obj.animate(cur_frame), obj.rect)
+
+    def render_tiles(self, tile_manager, surface : pygame.Surface):
+        # the chunks only need drawing again if the tiles, the tileset sprite (e.g. a new zoom) or the grid changed
+        baked_from = self.baked_from
+        if baked_from == None or baked_from[0] is not tile_manager.tile_sets[self.tileset]["sprite"] or baked_from[1] != self.grid_scale:
+            self.bake(tile_manager)
+
+        chunk_w = chunk_tiles * self.grid_scale[0]
+        chunk_h = chunk_tiles * self.grid_scale[1]
+        view = surface.get_rect()
+        for chunk_x in range(view.left // chunk_w, (view.right - 1) // chunk_w + 1):
+            for chunk_y in range(view.top // chunk_h, (view.bottom - 1) // chunk_h + 1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk != None:
+                    surface.blit(chunk, (chunk_x * chunk_w, chunk_y * chunk_h))
 
 def process_input(manager : GraphicsManager, my_map : Map):
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            print(f"Frame pacing: {pacer.stats()}")
             for tileset in manager.tile_sets:
                 manager.unload_tileset_sprite(tileset)
                 manager.unload_tileset_data(tileset)
@@ -215,13 +289,9 @@ def main():
     my_map.load_data("map")
 
     while (True):
-        start = time.time()
         process_input(manager, my_map)
         render(manager, my_map, frames)
-        sleep_time = start + frame_time - time.time()
-        if sleep_time < 0:
-            sleep_time = 0
-        time.sleep(sleep_time)
+        pacer.wait()
         frames += 1
 
 if __name__ == "__main__":
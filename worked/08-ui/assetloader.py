@@ -0,0 +1,74 @@
+import queue, threading
+from concurrent.futures import Future
+
+class LoadRequest():
+    def __init__(self, work, finish, priority, order):
+        self.work = work # work() -> result, runs on a loader thread
+        self.finish = finish # finish(result), runs on the main thread in poll()
+        self.priority = priority
+        self.order = order
+        self.future = Future()
+        self.cancelled = False
+
+    def __lt__(self, other):
+        # lower priority first, then first come first served
+        return (self.priority, self.order) < (other.priority, other.order)
+
+class AssetLoader():
+    # does the slow part of loading (reading files, parsing, decoding images) on background threads so the
+    # frame doesn't stall, then hands the result back to the main thread to finish off in poll()
+    # anything which has to happen on the main thread (convert_alpha, which needs the display) goes in finish
+    #
+    #   request = loader.submit(lambda: parse(path), lambda result: store(result))
+    #   ...
+    #   loader.poll() # once a frame
+    def __init__(self, workers = 2):
+        self.waiting = queue.PriorityQueue()
+        self.done = queue.Queue()
+        self.order = 0
+        self.lock = threading.Lock()
+        self.threads = []
+        for i in range(workers):
+            # daemon threads, so quitting mid load doesn't wait for them
+            thread = threading.Thread(target=self.run, name=f"asset-loader-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, work, finish = None, priority = 0):
+        with self.lock:
+            self.order += 1
+            request = LoadRequest(work, finish, priority, self.order)
+        self.waiting.put(request)
+        return request
+
+    def cancel(self, request : LoadRequest):
+        # if it hasn't started it never will, if it has its result is thrown away instead of finished
+        request.cancelled = True
+        request.future.cancel()
+
+    def run(self):
+        while True:
+            request = self.waiting.get()
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            try:
+                request.future.set_result(request.work())
+            except BaseException as e:
+                request.future.set_exception(e)
+            self.done.put(request)
+
+    def poll(self):
+        # finish everything that's been loaded since last time, call from the main thread
+        finished = 0
+        while True:
+            try:
+                request = self.done.get_nowait()
+            except queue.Empty:
+                return finished
+            if request.cancelled:
+                continue
+            # raises here, on the main thread, if the loading failed
+            result = request.future.result()
+            if request.finish != None:
+                request.finish(result)
+            finished += 1
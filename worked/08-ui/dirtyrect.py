@@ -0,0 +1,71 @@
+import pygame
+
+class DirtyRectRenderer():
+    # instead of filling the whole screen and flipping every frame, remember what was drawn where last frame
+    # and only erase / redraw / send to the display the areas which changed
+    # works best when most of the screen is a background that doesn't change (like a tile map)
+    def __init__(self, screen : pygame.Surface, clear_colour = (0, 0, 0)):
+        self.screen = screen
+        self.clear_colour = clear_colour
+        self.background = None # same size as the screen, None means just clear_colour
+        self.previous = {} # key -> (surface, rect) drawn last frame
+        self.current = {}
+        # a surface can be drawn again with a different alpha (e.g. cached text fading out), which needs redrawing too
+        self.previous_alpha = {}
+        self.current_alpha = {}
+        self.full_redraw = True
+
+    def invalidate(self):
+        # call when the background changes, the next present() redraws everything
+        self.full_redraw = True
+
+    def draw(self, key, surface : pygame.Surface, position):
+        # queue a sprite for this frame - key must stay the same for the same thing between frames
+        # sprites are drawn in the order they are queued
+        self.current[key] = (surface, surface.get_rect(topleft=position))
+        self.current_alpha[key] = surface.get_alpha()
+
+    def erase(self, rect : pygame.Rect):
+        if self.background == None:
+            self.screen.fill(self.clear_colour, rect)
+        else:
+            self.screen.blit(self.background, rect, rect)
+
+    def find_dirty(self):
+        dirty = []
+        for key, (surface, rect) in self.previous.items():
+            now = self.current.get(key)
+            if now == None:
+                dirty.append(rect)
+            elif now[0] is not surface or now[1] != rect or self.current_alpha[key] != self.previous_alpha[key]:
+                dirty.append(rect)
+                dirty.append(now[1])
+        for key, (surface, rect) in self.current.items():
+            if key not in self.previous:
+                dirty.append(rect)
+        return dirty
+
+    def present(self):
+        if self.full_redraw:
+            self.erase(self.screen.get_rect())
+            self.screen.blits(list(self.current.values()), False)
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            dirty = self.find_dirty()
+            if len(dirty) > 0:
+                sprites = list(self.current.values())
+                sprite_rects = [rect for surface, rect in sprites]
+                for area in dirty:
+                    # clip to the dirty area so overlapping sprites outside it aren't blended twice
+                    self.screen.set_clip(area)
+                    self.erase(area)
+                    for i in area.collidelistall(sprite_rects):
+                        self.screen.blit(sprites[i][0], sprite_rects[i])
+                self.screen.set_clip(None)
+                pygame.display.update(dirty)
+
+        self.previous = self.current
+        self.current = {}
+        self.previous_alpha = self.current_alpha
+        self.current_alpha = {}
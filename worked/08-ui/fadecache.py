@@ -0,0 +1,40 @@
+import pygame
+
+class FadeCache():
+    # copying a sprite and setting its alpha every frame it's faded makes a new surface every time
+    # instead opacity is rounded to one of `steps` levels, and each sprite gets one copy per level the first
+    # time it's needed - every object showing that sprite at that level shares it
+    # copies are grouped by owner (the tileset they came from), so unloading a tileset can drop all of them
+    def __init__(self, steps = 16):
+        self.steps = steps
+        self.owners = {} # owner -> {(sprite, level): faded copy}
+        self.hits = 0
+        self.misses = 0
+
+    def level(self, opacity):
+        # 0 is invisible, steps - 1 is fully opaque
+        return max(0, min(self.steps - 1, round(opacity * (self.steps - 1) / 255)))
+
+    def get(self, sprite : pygame.Surface, opacity, owner):
+        level = self.level(opacity)
+        if level == self.steps - 1:
+            return sprite
+        faded = self.owners.setdefault(owner, {})
+        key = (sprite, level)
+        surface = faded.get(key)
+        if surface != None:
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = sprite.copy()
+        surface.set_alpha(round(level * 255 / (self.steps - 1)))
+        faded[key] = surface
+        return surface
+
+    def evict(self, owner):
+        # call when the owner's sprites go away, otherwise the copies would keep them alive
+        self.owners.pop(owner, None)
+
+    def __len__(self):
+        return sum(len(faded) for faded in self.owners.values())
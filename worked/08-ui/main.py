@@ -1,15 +1,39 @@
-import pygame, time, sys, math, random
+import pygame, sys, math, random
+from collections import deque
 from enum import IntEnum
 from pathlib import Path
+from dirtyrect import DirtyRectRenderer
+from pool import ObjectPool
+from textcache import TextCache, GlyphAtlas
+from fadecache import FadeCache
+from assetloader import AssetLoader
+from scalecache import ScaleCache
+from framepacer import FramePacer
+import tracing
 pygame.init()
 
 size = width, height = (640, 480) # 20 x 15 at 32 x 32 tiles
 black = (0, 0, 0)
 screen = pygame.display.set_mode(size)
 frame_time = 1.0 / 30.0
+pacer = FramePacer(frame_time) # sleeps out the rest of each frame in main()
 do_render = False
 asset_path = Path("./assets/")
+chunk_tiles = 16 # the map is baked into chunks of 16 x 16 tiles
 ui_font = pygame.font.Font(None, 24)
+white = (255, 255, 255)
+# damage numbers are put together from pre-rendered digits, anything else goes through the cache
+ui_digits = GlyphAtlas(ui_font, True, white)
+text_cache = TextCache()
+# faded copies of sprites, at 16 levels of opacity, dropped when their tileset's sprites are unloaded
+fade_cache = FadeCache(16)
+# only the actors and damage numbers change each frame, so only redraw around them
+use_dirty_rects = True
+renderer = DirtyRectRenderer(screen, black)
+# z cycles the tiles through these zoom levels, the tilesets are 16 x 16 so zoom 2 fits the 32 x 32 grid
+zoom_levels = [1, 2, 3]
+zoom_level = 2
+tile_size = 16
 
 class CustomEvent(IntEnum):
     AFTER_UPDATE = pygame.event.custom_type()
@@ -27,13 +51,38 @@ class GameObject:
 
     def __init__(self, rect : pygame.rect.Rect, obj_type : str, animation_speed : float = 1):
         self.rect = rect
+        self.map_rect = None # where the map file put it, in pixels at the map's zoom level - see Map.set_zoom
         self.text = None
+        self.text_surface = None # rendered from text_rendered, this object's own so its alpha can be changed
+        self.text_rendered = None
         self.opacity = 255
         self.animations = None
         if obj_type != None:
             self.animations = GameObject.animations_dict[obj_type]
         self.cur_animation = 0
         self.animation_speed = animation_speed
+        self.frames = None # a tuple of surfaces for each of animations, see bind_frames
+        self.frames_from = None # the tileset sprite the frames were cut from
+        self.frame = -1 # frame of sprite_animation that sprite is
+        self.sprite_animation = -1
+        self.sprite = None
+
+    def bind_frames(self, animation_frames, sprite_sheet : pygame.Surface):
+        # animation_frames is {animation name: tuple of surfaces} from GraphicsManager.compile_animations
+        self.frames = [animation_frames[name] for name in self.animations]
+        self.frames_from = sprite_sheet
+        self.frame = -1
+
+    def animate(self, cur_frame):
+        # the surface to draw this frame, only looked up again when the frame or animation changes
+        frames = self.frames[self.cur_animation]
+        # loop the animation
+        frame = int(cur_frame * self.animation_speed) % len(frames)
+        if frame != self.frame or self.cur_animation != self.sprite_animation:
+            self.frame = frame
+            self.sprite_animation = self.cur_animation
+            self.sprite = frames[frame]
+        return self.sprite
 
 # never use this - it's a base class
 class EventHandler():
@@ -46,12 +95,26 @@ class EventHandler():
 class DamageUiHandler(EventHandler):
     def __init__(self, obj : GameObject, spawn_frame, travel_distance = 20, time = 1.0):
         self.travel_distance = travel_distance
-        self.start_rect = obj.rect
+        self.start_rect = obj.rect.copy()
         self.spawn_frame = spawn_frame
         self.time = time # time in seconds to do the travel
         # always goes from 255 to 0 opacity in a smooth lerp
         super().__init__(obj)
 
+    def spawn(self, rect : pygame.Rect, spawn_frame, text):
+        # set a pooled damage number up again, the rects are changed in place rather than replaced
+        self.start_rect.update(rect)
+        self.object.rect.update(rect)
+        self.object.text = text
+        self.object.opacity = 255
+        self.spawn_frame = spawn_frame
+
+    def rescale(self, scale):
+        # the map has changed zoom, keep rising from the same spot on it
+        offset = self.object.rect.y - self.start_rect.y
+        self.start_rect.topleft = (round(self.start_rect.x * scale), round(self.start_rect.y * scale))
+        self.object.rect.topleft = (self.start_rect.x, self.start_rect.y + offset)
+
     def on_event(self, ev, cur_map):
         if not ev.type == CustomEvent.AFTER_UPDATE:
             return
@@ -63,7 +126,7 @@ class DamageUiHandler(EventHandler):
 
         # if animation has finished, delete object (and self, indirectly)
         if cur_frames > time_as_frames:
-            cur_map.objects.remove(self.object)
+            cur_map.despawn(self)
             return
 
         # calculate the scalar (value between 0-1) used to calculate opacity and position
@@ -74,7 +137,8 @@ class DamageUiHandler(EventHandler):
 
         # set position using scalar and the travel distance variable
         # move straight up - could be altered in real game to allow juicy damage animations
-        self.object.rect = self.start_rect.move(0, -(self.travel_distance * scalar))
+        # (same as start_rect.move, which truncates the offset)
+        self.object.rect.y = self.start_rect.y + int(-(self.travel_distance * scalar))
         
 
 class OnClickHandler(EventHandler):
@@ -86,23 +150,64 @@ class OnClickHandler(EventHandler):
         if (not ev.type == CustomEvent.CLICKED_ON) or cur_map.paused:
             return
         
-        # create a new gameobject in the same position as object this handler is attached to
-        new_obj = GameObject(self.object.rect.copy(), None)
-        # make a random value and set the text to it
-        new_obj.text = str(random.randint(1000, 10000))
-        # add object to map
-        cur_map.objects.append(new_obj)
-        # create a new handler attached to the object with the appropriate spawn_time, time (to complete), and travel_distance variables
-        new_handler = DamageUiHandler(new_obj, ev.frame, time=0.5, travel_distance=25)
-        # add the handler to the map handlers
+        # get a damage number (its object and handler) from the pool
+        new_handler = cur_map.acquire_popup()
+        # put it in the same position as object this handler is attached to, with a random value as the text
+        new_handler.spawn(self.object.rect, ev.frame, str(random.randint(1000, 10000)))
+        # add object and handler to map
+        cur_map.objects.append(new_handler.object)
         cur_map.handlers.append(new_handler)
 
+@tracing.traced()
+def parse_tileset_data(data_file):
+    # only files and plain data in here, so it can run on a loader thread
+    tile_data = {}
+    animations = {}
+    with open(data_file, 'r') as f:
+        for line in f:
+            split = line.split()
+            # not a tile or animation, ignore it
+            if len(split) != 5 and len(split) != 6:
+                continue
+            # otherwise, store this data as a rect and load to animations if needed
+            num_tiles = 1
+            # note split[0] is immutable, while tile_name shouldn't be
+            tile_name = split[0]
+            is_anim = False
+
+            if len(split) == 6:
+                is_anim = True
+                num_tiles = int(split[5])
+                animations[split[0]] = []
+
+            r = [int(x) for x in split[1:5]]
+            for frame in range(num_tiles):
+                if frame > 0:
+                    tile_name = split[0] + f"_{frame}"
+                tile_data[tile_name] = {"rect": pygame.Rect(r)}
+                if is_anim:
+                    animations[split[0]].append(tile_name)
+                r[0] += r[2]
+    return tile_data, animations
+
+@tracing.traced()
+def decode_tileset_image(image_path, zoom_level):
+    # the slow half of loading a tileset's sprite, neither decoding nor scaling needs the display so it can run on a loader thread
+    # returns the unscaled image too, so other zoom levels can be made from it later
+    tileset_sprite = pygame.image.load(image_path)
+    return tileset_sprite, pygame.transform.scale(tileset_sprite, (tileset_sprite.get_width() * zoom_level, tileset_sprite.get_height() * zoom_level))
+
 class GraphicsManager:
     def __init__(self, meta_index):
         # includes only name and filename of index {"dungeon": "index"}
         self.run_level = 0
         self.tile_sets = self.load_index(meta_index)
         self.run_level = 1
+        self.loader = None # made the first time something is loaded in the background
+        self.loading = {} # tileset -> LoadRequest in flight
+        # each tileset's sprite at the zoom levels it has been used at, so changing zoom doesn't load it again
+        self.scaled = ScaleCache(3)
+        self.zoom_level = None # what set_zoom last switched to, None until it's been called
 
     def load_index(self, index):
         index_out = {}
@@ -112,61 +217,126 @@ class GraphicsManager:
                 index_out[split[0]] = {"data_file": split[1], "texture": split[2], "tile_data": {}, "animations": {}}
         return index_out
 
+    @tracing.traced()
     def load_tileset_data(self, name):
         data_file = asset_path / self.tile_sets[name]["data_file"]
-        with open(data_file, 'r') as f:
-            for line in f:
-                split = line.split()
-                # not a tile or animation, ignore it
-                if len(split) != 5 and len(split) != 6:
-                    continue
-                # otherwise, store this data as a rect and load to animations if needed
-                num_tiles = 1
-                # note split[0] is immutable, while tile_name shouldn't be
-                tile_name = split[0]
-                is_anim = False
-
-                if len(split) == 6:
-                    is_anim = True
-                    num_tiles = int(split[5])
-                    self.tile_sets[name]["animations"][split[0]] = []
-
-                r = [int(x) for x in split[1:5]]
-                for frame in range(num_tiles):
-                    if frame > 0:
-                        tile_name = split[0] + f"_{frame}"
-                    self.tile_sets[name]["tile_data"][tile_name] = {"rect": pygame.Rect(r)}
-                    if is_anim:
-                        self.tile_sets[name]["animations"][split[0]].append(tile_name)
-                    r[0] += r[2]
-                
+        self.set_tileset_data(name, *parse_tileset_data(data_file))
+
+    @tracing.traced()
+    def set_tileset_data(self, name, tile_data, animations):
+        self.tile_sets[name]["tile_data"] = tile_data
+        self.tile_sets[name]["animations"] = animations
         self.run_level = 2
         print(f"Loaded data from {name}")
         print(self.tile_sets[name])
     
+    @tracing.traced()
     def load_tileset_sprite(self, ts, zoom_level = 1):
-        # it's already loaded
-        if "sprite" in self.tile_sets[ts]:
+        # already loaded, at this zoom or another one which can be scaled from the same image
+        if self.scaled.has_image(ts):
+            self.set_zoom_level(ts, zoom_level)
             return
         image_path = asset_path / self.tile_sets[ts]["texture"]
-        tileset_sprite = pygame.image.load(image_path).convert_alpha()
-        tileset_sprite = pygame.transform.scale(tileset_sprite, (tileset_sprite.get_width() * zoom_level, tileset_sprite.get_height() * zoom_level))
-        self.tile_sets[ts]["sprite"] = tileset_sprite
-        for tile in self.tile_sets[ts]["tile_data"].values():
-            r : pygame.Rect = tile["rect"]
-            scaled_rect = pygame.Rect(r.left * zoom_level, r.top * zoom_level, r.width * zoom_level, r.height * zoom_level)
-            tile["surface"] = tileset_sprite.subsurface(scaled_rect)
+        self.set_tileset_sprite(ts, *decode_tileset_image(image_path, zoom_level), zoom_level)
+
+    @tracing.traced()
+    def set_tileset_sprite(self, ts, image : pygame.Surface, scaled : pygame.Surface, zoom_level):
+        # the main thread half: convert to the display's format and cut out the tiles
+        if self.scaled.has_image(ts):
+            self.set_zoom_level(ts, zoom_level)
+            return
+        self.scaled.set_image(ts, image.convert_alpha(), zoom_level, scaled.convert_alpha())
+        self.set_zoom_level(ts, zoom_level)
         self.run_level = 3
         print(f"Loaded sprites from {ts}")
 
+    def set_zoom(self, zoom_level):
+        # every loaded tileset, and anything still loading once it's finished
+        self.zoom_level = zoom_level
+        for ts in self.tile_sets:
+            if "sprite" in self.tile_sets[ts]:
+                self.set_zoom_level(ts, zoom_level)
+
+    @tracing.traced()
+    def set_zoom_level(self, ts, zoom_level):
+        # the scaled sprite is made the first time a zoom level is used, switching back to one is only swapping surfaces
+        tile_set = self.tile_sets[ts]
+        if tile_set.get("zoom_level") == zoom_level and "sprite" in tile_set:
+            return
+        sprite, surfaces = self.scaled.get(ts, zoom_level, tile_set["tile_data"])
+        # faded copies are of the old zoom's tiles
+        fade_cache.evict(ts)
+        tile_set["sprite"] = sprite
+        tile_set["zoom_level"] = zoom_level
+        for name, tile in tile_set["tile_data"].items():
+            tile["surface"] = surfaces[name]
+
+    def load_tileset_async(self, name, data = True, sprites = False, zoom_level = 1, priority = 0, on_loaded = None):
+        # same as load_tileset_data / load_tileset_sprite, but the files are read and decoded on a loader thread
+        # and only the last step happens on the main thread in poll(), which calls on_loaded(name) when it's done
+        # returns a future for the parsed / decoded files
+        if self.loader == None:
+            self.loader = AssetLoader()
+        self.cancel_loading(name)
+        data_file = asset_path / self.tile_sets[name]["data_file"]
+        image_path = asset_path / self.tile_sets[name]["texture"]
+
+        def work():
+            result = {}
+            if data:
+                result["data"] = parse_tileset_data(data_file)
+            if sprites:
+                result["image"] = decode_tileset_image(image_path, zoom_level)
+            return result
+
+        def finish(result):
+            if self.loading.get(name) is request:
+                del self.loading[name]
+            if data:
+                self.set_tileset_data(name, *result["data"])
+            if sprites:
+                self.set_tileset_sprite(name, *result["image"], zoom_level)
+                if self.zoom_level != None:
+                    # the zoom may have changed since this started loading
+                    self.set_zoom_level(name, self.zoom_level)
+            if on_loaded != None:
+                on_loaded(name)
+
+        request = self.loader.submit(work, finish, priority)
+        self.loading[name] = request
+        return request.future
+
+    def cancel_loading(self, name):
+        request = self.loading.pop(name, None)
+        if request != None:
+            self.loader.cancel(request)
+
+    @tracing.traced()
+    def poll(self):
+        # call once a frame to finish anything loaded in the background
+        if self.loader != None:
+            self.loader.poll()
+
+    def compile_animations(self, name):
+        # every animation as a tuple of its frames' surfaces, so finding an actor's sprite is indexing instead of
+        # going through animations and tile_data by name
+        tile_set = self.tile_sets[name]
+        tile_data = tile_set["tile_data"]
+        return {animation: tuple(tile_data[tile]["surface"] for tile in tiles) for animation, tiles in tile_set["animations"].items()}
+
     def unload_tileset_sprite(self, name):
+        self.cancel_loading(name)
+        fade_cache.evict(name)
+        self.scaled.evict(name)
         for tile in self.tile_sets[name]["tile_data"].values():
             del tile["surface"]
         del self.tile_sets[name]["sprite"]
+        del self.tile_sets[name]["zoom_level"]
         print(f"Deleted sprites from {name}")
         self.run_level = 2
 
     def unload_tileset_data(self, name):
+        self.cancel_loading(name)
         # just wipe everything
         self.tile_sets[name]["tile_data"] = {}
         self.tile_sets[name]["animations"] = {}
@@ -180,16 +350,46 @@ class Map:
         self.handlers = []
         self.objects : list[GameObject] = []
         self.grid_scale = grid_scale
+        # positions in the map file are in pixels at the zoom the grid starts at
+        self.map_zoom = grid_scale[0] // tile_size
+        self.zoom_level = self.map_zoom
+        self.chunks = {} # (chunk x, chunk y) -> surface with all of that chunk's tiles already drawn on it
+        self.baked_from = None # (tileset sprite, grid scale) the chunks were drawn with
+        self.animation_frames = None # compiled from the tileset, see GraphicsManager.compile_animations
+        self.frames_from = None # the tileset sprite (and so zoom) animation_frames was compiled from
         self.paused = False
+        # damage numbers are recycled, the pool makes a new one (with time and travel distance set) only when it's empty
+        self.popup_pool = ObjectPool(lambda: DamageUiHandler(GameObject(pygame.Rect(0, 0, 0, 0), None), 0, time=0.5, travel_distance=25), capacity=64, max_live=256)
+        self.popups = deque() # damage numbers on screen, oldest first
+        self.recycled_popups = 0
+        self.despawned = [] # handlers finished this frame, removed at the end of update()
+
+    def despawn(self, handler : EventHandler):
+        self.despawned.append(handler)
+
+    def acquire_popup(self):
+        # if there are too many damage numbers on screen already, the oldest one is taken off and used again
+        # rather than the click showing nothing
+        handler = self.popup_pool.acquire()
+        if handler == None:
+            handler = self.popups.popleft()
+            self.objects.remove(handler.object)
+            self.handlers.remove(handler)
+            self.recycled_popups += 1
+        self.popups.append(handler)
+        return handler
 
     def load_data(self, map_file):
+        # the tiles are changing, bake them again next render
+        self.baked_from = None
         with open(asset_path / map_file, "r") as f:
             for line in f:
                 split = line.split()
                 if len(split) == 3:
                     print(split)
                     obj_rect = pygame.rect.Rect(int(split[1]), int(split[2]), 32, 32)
-                    cur_obj = GameObject(obj_rect, split[0], 0.5)
+                    cur_obj = GameObject(self.zoomed(obj_rect), split[0], 0.5)
+                    cur_obj.map_rect = obj_rect
                     cur_handler = OnClickHandler(cur_obj)
                     self.objects.append(cur_obj)
                     self.handlers.append(cur_handler)
@@ -197,6 +397,23 @@ class Map:
                 elif len(split) == 5:
                     self.tile_data.append({"tile": split[0], "pos": (int(split[1]), int(split[2])), "size": (int(split[3]), int(split[4])) })
                 
+    def zoomed(self, map_rect : pygame.Rect):
+        # a rect from the map file, moved and resized to the current zoom
+        scale = self.zoom_level / self.map_zoom
+        return pygame.Rect(round(map_rect.x * scale), round(map_rect.y * scale), round(map_rect.width * scale), round(map_rect.height * scale))
+
+    def set_zoom(self, zoom_level):
+        # the tiles are baked again (the grid has changed), everything on the map is moved and resized to match
+        # so it's drawn and clicked in the right place
+        scale = zoom_level / self.zoom_level
+        self.zoom_level = zoom_level
+        self.grid_scale = (tile_size * zoom_level, tile_size * zoom_level)
+        for obj in self.objects:
+            if obj.map_rect != None:
+                obj.rect.update(self.zoomed(obj.map_rect))
+        for handler in self.popups:
+            handler.rescale(scale)
+
     def check_click(self, point, frames):
         print("Check click on map")
         for handler in self.handlers:
@@ -204,55 +421,140 @@ class Map:
                 handler.on_event(pygame.event.Event(CustomEvent.CLICKED_ON,{"frame": frames}), self)
 
     def render(self, tile_manager, cur_frame):
+        self.render_tiles(tile_manager, screen)
+        self.render_objects(tile_manager, cur_frame, lambda key, surface, position: screen.blit(surface, position))
+
+    @tracing.traced()
+    def bake(self, tile_manager):
+        # draw every tile once into the chunk(s) it covers, after this a chunk is a single blit
+        self.chunks = {}
+        chunk_w = chunk_tiles * self.grid_scale[0]
+        chunk_h = chunk_tiles * self.grid_scale[1]
         for r in self.tile_data:
             start_x = r["pos"][0] * self.grid_scale[0]
             start_y = r["pos"][1] * self.grid_scale[1]
             width = r["size"][0]
             height = r["size"][1]
             sprite = tile_manager.tile_sets[self.tileset]["tile_data"][r["tile"]]["surface"]
+            sprite_w, sprite_h = sprite.get_size()
             for x in range(width):
                 for y in range(height):
-                    screen.blit(sprite, (start_x + (x * self.grid_scale[0]), start_y + (y * self.grid_scale[1])))
+                    tile_x = start_x + (x * self.grid_scale[0])
+                    tile_y = start_y + (y * self.grid_scale[1])
+                    # a tile bigger than the grid can spill over into the next chunk
+                    for chunk_x in range(tile_x // chunk_w, (tile_x + sprite_w - 1) // chunk_w + 1):
+                        for chunk_y in range(tile_y // chunk_h, (tile_y + sprite_h - 1) // chunk_h + 1):
+                            chunk = self.chunks.get((chunk_x, chunk_y))
+                            if chunk == None:
+                                chunk = pygame.Surface((chunk_w, chunk_h), pygame.SRCALPHA).convert_alpha()
+                                self.chunks[(chunk_x, chunk_y)] = chunk
+                            chunk.blit(sprite, (tile_x - chunk_x * chunk_w, tile_y - chunk_y * chunk_h))
+        self.baked_from = (tile_manager.tile_sets[self.tileset]["sprite"], self.grid_scale)
+
+    def render_tiles(self, tile_manager, surface : pygame.Surface):
+        # the chunks only need drawing again if the tiles, the tileset sprite (e.g. a new zoom) or the grid changed
+        baked_from = self.baked_from
+        if baked_from == None or baked_from[0] is not tile_manager.tile_sets[self.tileset]["sprite"] or baked_from[1] != self.grid_scale:
+            self.bake(tile_manager)
+
+        chunk_w = chunk_tiles * self.grid_scale[0]
+        chunk_h = chunk_tiles * self.grid_scale[1]
+        view = surface.get_rect()
+        for chunk_x in range(view.left // chunk_w, (view.right - 1) // chunk_w + 1):
+            for chunk_y in range(view.top // chunk_h, (view.bottom - 1) // chunk_h + 1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk != None:
+                    surface.blit(chunk, (chunk_x * chunk_w, chunk_y * chunk_h))
+
+    def render_objects(self, tile_manager, cur_frame, draw):
+        # draw(key, surface, position) does the actual drawing, so this can go to the screen or a DirtyRectRenderer
+        # the frames only need compiling again when the tileset's sprite is loaded again or changes zoom
+        sprite_sheet = tile_manager.tile_sets[self.tileset]["sprite"]
+        if self.frames_from is not sprite_sheet:
+            self.animation_frames = tile_manager.compile_animations(self.tileset)
+            self.frames_from = sprite_sheet
         for obj in self.objects:
             sprite = None
 
             if obj.animations != None:
-                cur_animation_frames = tile_manager.tile_sets[self.tileset]["animations"][obj.animations[obj.cur_animation]]
-                # loop the animation
-                cur_frame_tile = cur_animation_frames[math.floor(cur_frame * obj.animation_speed) % len(cur_animation_frames)]
-                # get the actual sprite for the animation
-                sprite : pygame.surface.Surface = tile_manager.tile_sets[self.tileset]["tile_data"][cur_frame_tile]["surface"]
+                if obj.frames_from is not sprite_sheet:
+                    obj.bind_frames(self.animation_frames, sprite_sheet)
+                sprite : pygame.surface.Surface = obj.animate(cur_frame)
             text_surface = None
             
             if obj.text != None:
-                text_surface = ui_font.render(obj.text, True, (255,255,255))
+                # only render when the text changes, not every frame
+                if obj.text_rendered != obj.text:
+                    if ui_digits.can_render(obj.text):
+                        obj.text_surface = ui_digits.render(obj.text, obj.text_surface)
+                    else:
+                        obj.text_surface = text_cache.render(ui_font, obj.text, True, white).copy()
+                    obj.text_rendered = obj.text
+                text_surface = obj.text_surface
                 text_surface.set_alpha(obj.opacity)
 
             if obj.opacity < 255 and sprite != None:
-                # used for animations, so it should be okay to spawn new surfaces even though this is generally suboptimal
-                sprite = sprite.copy()
-                sprite.set_alpha(obj.opacity)
+                # a copy at the nearest of 16 opacities, shared with every other object fading the same sprite
+                sprite = fade_cache.get(sprite, obj.opacity, self.tileset)
             
             if sprite != None:
-                screen.blit(sprite, obj.rect)
+                draw((obj, "sprite"), sprite, obj.rect.topleft)
     
             if text_surface != None:
-                screen.blit(text_surface, obj.rect)
+                draw((obj, "text"), text_surface, obj.rect.topleft)
+
+def set_render(new_render):
+    global do_render
+    do_render = new_render
+    # tiles were loaded or unloaded, so the background has to be drawn again
+    renderer.invalidate()
+
+def render_when_loaded(tilesets, new_render):
+    # an on_loaded callback for load_tileset_async, which switches rendering once every tileset is in
+    waiting = set(tilesets)
+    def loaded(tileset):
+        waiting.discard(tileset)
+        if len(waiting) == 0:
+            set_render(new_render)
+    return loaded
+
+def change_zoom(manager : GraphicsManager, my_map : Map):
+    global zoom_level
+    zoom_level = zoom_levels[(zoom_levels.index(zoom_level) + 1) % len(zoom_levels)]
+    manager.set_zoom(zoom_level)
+    my_map.set_zoom(zoom_level)
+    renderer.invalidate()
 
 def process_input(manager : GraphicsManager, my_map : Map, frames: int):
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            print(f"Frame pacing: {pacer.stats()}")
+            print(f"Damage numbers: {my_map.popup_pool.stats()}, {my_map.recycled_popups} recycled")
             for tileset in manager.tile_sets:
                 manager.unload_tileset_sprite(tileset)
                 manager.unload_tileset_data(tileset)
             sys.exit()
+        elif event.type == pygame.WINDOWEXPOSED or event.type == pygame.VIDEOEXPOSE:
+            # the window was covered, minimised or restored - only the dirty rects would be redrawn otherwise
+            renderer.invalidate()
         elif event.type == pygame.MOUSEBUTTONDOWN:
             my_map.check_click(pygame.mouse.get_pos(), frames)
         elif event.type == pygame.KEYDOWN:
             key_name = pygame.key.name(event.key)
+            if event.key == pygame.K_F5:
+                # F5 starts recording a trace, F5 again writes it out
+                tracing.toggle()
+                continue
+            if key_name == "z":
+                change_zoom(manager, my_map)
+                continue
             if key_name not in ["1", "2", "3"]:
                 return
 
+            # anything still loading was asked for by an earlier key press
+            for tileset in manager.tile_sets:
+                manager.cancel_loading(tileset)
+
             unload_sprites = False
             unload_data = False
             load_sprites = False
@@ -282,36 +584,61 @@ def process_input(manager : GraphicsManager, my_map : Map, frames: int):
                 new_render = True
 
             for tileset in manager.tile_sets:
-                if load_data:
-                    manager.load_tileset_data(tileset)
-                if load_sprites:
-                    manager.load_tileset_sprite(tileset, 2)
                 if unload_sprites:
                     manager.unload_tileset_sprite(tileset)
                 if unload_data:
                     manager.unload_tileset_data(tileset)
-            
-            global do_render
-            do_render = new_render
 
+            if not (load_data or load_sprites):
+                set_render(new_render)
+                continue
+
+            # loading happens in the background so frames keep going, rendering switches over once it's done
+            on_loaded = render_when_loaded(manager.tile_sets, new_render)
+            for tileset in manager.tile_sets:
+                manager.load_tileset_async(tileset, load_data, load_sprites, zoom_level, on_loaded=on_loaded)
+
+@tracing.traced()
 def render(manager, my_map, frames):
-    screen.fill(black)
+    if not use_dirty_rects:
+        screen.fill(black)
+        if do_render:
+            my_map.render(manager, frames)
+        pygame.display.flip()
+        return
+
+    if renderer.full_redraw:
+        # the tiles never change between loads, so they're drawn once into the background
+        background = pygame.Surface(size).convert()
+        background.fill(black)
+        if do_render:
+            my_map.render_tiles(manager, background)
+        renderer.background = background
+
     if do_render:
-        my_map.render(manager, frames)
-    pygame.display.flip()
+        my_map.render_objects(manager, frames, renderer.draw)
+    renderer.present()
 
+@tracing.traced()
 def update(cur_map, frames):
-    for handler in cur_map.handlers:
-        handler.on_event(pygame.event.Event(CustomEvent.AFTER_UPDATE,{"frame": frames}), cur_map)
-
-    # remove any handlers whose objects have been deleted
-    # required to clean up after objects are destroyed
-    new_handlers = []
-    for handler in cur_map.handlers:
-        if handler.object not in cur_map.objects:
-            continue
-        new_handlers.append(handler)
-    cur_map.handlers = new_handlers
+    if tracing.enabled:
+        for handler in cur_map.handlers:
+            with tracing.span(f"{type(handler).__name__}.on_event"):
+                handler.on_event(pygame.event.Event(CustomEvent.AFTER_UPDATE,{"frame": frames}), cur_map)
+    else:
+        for handler in cur_map.handlers:
+            handler.on_event(pygame.event.Event(CustomEvent.AFTER_UPDATE,{"frame": frames}), cur_map)
+
+    # remove anything which finished this frame, and give it back to the pool
+    if len(cur_map.despawned) > 0:
+        finished = set(cur_map.despawned)
+        finished_objects = set(handler.object for handler in finished)
+        cur_map.objects = [obj for obj in cur_map.objects if obj not in finished_objects]
+        cur_map.handlers = [handler for handler in cur_map.handlers if handler not in finished]
+        cur_map.popups = deque(handler for handler in cur_map.popups if handler not in finished)
+        for handler in finished:
+            cur_map.popup_pool.release(handler)
+        cur_map.despawned = []
         
 
 def main():
@@ -324,14 +651,12 @@ def main():
     my_map.load_data("map")
 
     while (True):
-        start = time.time()
-        process_input(manager, my_map,frames)
-        update(my_map, frames)
-        render(manager, my_map, frames)
-        sleep_time = start + frame_time - time.time()
-        if sleep_time < 0:
-            sleep_time = 0
-        time.sleep(sleep_time)
+        with tracing.span("frame"):
+            manager.poll()
+            process_input(manager, my_map,frames)
+            update(my_map, frames)
+            render(manager, my_map, frames)
+        pacer.wait()
         frames += 1
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+import pygame
+from collections import OrderedDict
+
+class ScaleCache():
+    # the tileset sprite scaled to each zoom level it's been drawn at, along with the tiles cut out of it
+    # a zoom level is only scaled and sliced the first time it's asked for, after that switching to it is just
+    # handing back the surfaces. each tileset keeps its `max_levels` most recently used zoom levels
+    def __init__(self, max_levels = 3):
+        self.max_levels = max_levels
+        self.images = {} # tileset -> unscaled image, everything else is scaled from this
+        self.levels = {} # tileset -> {zoom level: (scaled sprite, {tile name: subsurface})}, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def has_image(self, tileset):
+        return tileset in self.images
+
+    def set_image(self, tileset, image : pygame.Surface, zoom_level = None, scaled : pygame.Surface = None):
+        # a new image makes anything scaled from the old one out of date
+        self.images[tileset] = image
+        self.levels[tileset] = OrderedDict()
+        if scaled != None:
+            # already scaled somewhere else (e.g. on a loader thread), no need to do it again
+            self.levels[tileset][zoom_level] = (scaled, {})
+
+    def get(self, tileset, zoom_level, tile_data):
+        # returns (scaled sprite, {tile name: subsurface}) for every tile in tile_data
+        levels = self.levels[tileset]
+        level = levels.get(zoom_level)
+        if level != None:
+            levels.move_to_end(zoom_level)
+            self.hits += 1
+        else:
+            self.misses += 1
+            image = self.images[tileset]
+            level = (pygame.transform.scale(image, (image.get_width() * zoom_level, image.get_height() * zoom_level)), {})
+            levels[zoom_level] = level
+            while len(levels) > self.max_levels:
+                levels.popitem(last=False)
+                self.evictions += 1
+
+        sprite, surfaces = level
+        if surfaces.keys() != tile_data.keys():
+            # first time at this level, or the tileset's data has been loaded again since
+            for name, tile in tile_data.items():
+                if name not in surfaces:
+                    r : pygame.Rect = tile["rect"]
+                    surfaces[name] = sprite.subsurface(pygame.Rect(r.left * zoom_level, r.top * zoom_level, r.width * zoom_level, r.height * zoom_level))
+        return level
+
+    def evict(self, tileset):
+        self.images.pop(tileset, None)
+        self.levels.pop(tileset, None)
+
+    def __len__(self):
+        return sum(len(levels) for levels in self.levels.values())
@@ -0,0 +1,83 @@
+import pygame
+from collections import OrderedDict
+
+class TextCache():
+    # font.render is slow, and most text on screen is the same from one frame to the next
+    # keeps the surfaces from recent calls keyed by (font, text, antialias, colour), dropping the least recently used
+    # the surfaces are shared, so copy one before changing it (e.g. set_alpha)
+    def __init__(self, max_entries = 256):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font : pygame.font.Font, text : str, antialias : bool, colour):
+        # same arguments as font.render
+        key = (font, text, antialias, tuple(colour))
+        surface = self.surfaces.get(key)
+        if surface != None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, colour)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+class GlyphAtlas():
+    # every character of `glyphs` rendered once, strings made only of those characters (like damage numbers or
+    # an fps count) are put together from them instead of going through font.render at all
+    # spacing comes from the font's advance for each glyph, so there is no kerning - fine for digits
+    def __init__(self, font : pygame.font.Font, antialias : bool, colour, glyphs = "0123456789"):
+        self.font = font
+        self.height = font.get_height()
+        self.glyphs = {} # character -> (surface, advance)
+        for character in glyphs:
+            advance = font.metrics(character)[0][4]
+            self.glyphs[character] = (font.render(character, antialias, colour), advance)
+
+    def can_render(self, text : str):
+        for character in text:
+            if character not in self.glyphs:
+                return False
+        return True
+
+    def size(self, text : str):
+        width = 0
+        for character in text:
+            width += self.glyphs[character][1]
+        if len(text) > 0:
+            # the last glyph can be wider than its advance
+            width += max(0, self.glyphs[text[-1]][0].get_width() - self.glyphs[text[-1]][1])
+        return (width, self.height)
+
+    def draw(self, surface : pygame.Surface, text : str, position):
+        # blit straight onto a surface, one blits() call for the whole string
+        x, y = position
+        batch = []
+        for character in text:
+            glyph, advance = self.glyphs[character]
+            batch.append((glyph, (x, y)))
+            x += advance
+        surface.blits(batch, False)
+
+    def render(self, text : str, surface : pygame.Surface = None):
+        # like font.render, but `surface` is reused if it's the right size, so the same text object can be
+        # re-rendered every time its number changes without allocating
+        size = self.size(text)
+        if surface == None or surface.get_size() != size:
+            surface = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+        surface.fill((0, 0, 0, 0))
+        x = 0
+        for character in text:
+            glyph, advance = self.glyphs[character]
+            # copy rather than blend onto the empty surface, so the edges keep their alpha
+            surface.blit(glyph, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            x += advance
+        return surface
@@ -0,0 +1,102 @@
+import json, threading, time
+from collections import deque
+from functools import wraps
+
+# spans of time spent in the game loop, saved as a Chrome trace (open in chrome://tracing, ui.perfetto.dev or
+# speedscope) to see exactly where a slow frame went
+#
+#   with tracing.span("bake"):
+#       ...
+#
+#   @tracing.traced()
+#   def render(...):
+#
+# nothing is recorded until start(), and until then a span is one check of `enabled`
+# only the last `capacity` spans are kept, so leaving it running doesn't grow forever
+
+enabled = False
+spans = deque(maxlen=200_000) # (name, start ns, duration ns, thread id, args)
+origin = time.perf_counter_ns()
+
+class Span():
+    def __init__(self, name, args = None):
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        spans.append((self.name, self.start, time.perf_counter_ns() - self.start, threading.get_ident(), self.args))
+
+class NoSpan():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+no_span = NoSpan()
+
+def span(name, args = None):
+    # args is a dict shown alongside the span in the viewer
+    if not enabled:
+        return no_span
+    return Span(name, args)
+
+def traced(name = None):
+    # decorator, the span is named after the function unless given a name
+    def decorate(function):
+        span_name = name if name != None else function.__qualname__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with Span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def start(capacity = None):
+    global enabled, spans
+    if capacity != None:
+        spans = deque(maxlen=capacity)
+    spans.clear()
+    enabled = True
+
+def stop():
+    global enabled
+    enabled = False
+
+def write(path):
+    # everything recorded so far as trace event json
+    events = []
+    recorded = list(spans)
+    threads = set()
+    for name, start_ns, duration_ns, thread, args in recorded:
+        event = {"name": name, "ph": "X", "ts": (start_ns - origin) / 1000, "dur": duration_ns / 1000, "pid": 0, "tid": thread}
+        if args != None:
+            event["args"] = args
+        events.append(event)
+        threads.add(thread)
+    for thread in threading.enumerate():
+        if thread.ident in threads:
+            events.append({"name": "thread_name", "ph": "M", "pid": 0, "tid": thread.ident, "args": {"name": thread.name}})
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    print(f"Wrote {len(recorded)} spans to {path}")
+    return path
+
+def toggle(path = None):
+    # start recording, or stop and write what was recorded - for binding to a key
+    if not enabled:
+        start()
+        print("Tracing started")
+        return None
+    stop()
+    if path == None:
+        path = f"trace-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    return write(path)
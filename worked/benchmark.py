@@ -0,0 +1,300 @@
+import argparse, contextlib, io, json, os, random, subprocess, sys, time
+from pathlib import Path
+
+# runs each worked chapter without a window (SDL's dummy video driver) and times a fixed number of
+# update ticks and render calls, then prints the timings as JSON
+# every chapter runs in its own process because they all have a main.py (and some share module names)
+# and most of them load assets relative to their own folder
+#
+#   python benchmark.py
+#   python benchmark.py --chapters 05 --balls 100 1000 --blocks 20 --strategies naive quadtree numpy
+#   python benchmark.py --chapters 04 --bullets 0 2000 --broadphases brute grid sweep_and_prune --output bench.json
+
+worked_path = Path(__file__).resolve().parent
+
+chapters = {
+    "01": "01-bouncy-balls",
+    "02": "02-render-optimisation",
+    "03": "03-render-priority",
+    "04": "04-collision-detection",
+    "05": "05-1000-bouncy-balls",
+    "06": "06-resource-cache",
+    "07": "07-animation-state",
+    "08": "08-ui",
+}
+# 00 is a terminal game using the keyboard module, there's nothing to render headless
+
+broadphases = ["brute", "grid", "sweep_and_prune"]
+
+def summarise(samples : list[float]):
+    # samples are in seconds, report milliseconds
+    if len(samples) == 0:
+        return {"count": 0}
+    ordered = sorted(samples)
+    def percentile(p):
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))
+        return ordered[index] * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": sum(samples) / len(samples) * 1000,
+        "p50_ms": percentile(50),
+        "p99_ms": percentile(99),
+    }
+
+def time_calls(function, count : int):
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        function(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+# each of these gets the chapter's main module already imported (with the dummy driver)
+# and returns (update(i), render(i)) functions plus anything worth reporting about the world
+
+def load_chapter_01(main, spec):
+    return (lambda i: main.update()), (lambda i: main.render()), {}
+
+def load_game_chapter(main, spec):
+    # 02, 03 and 04 all have a Game class with setup / update / render
+    if "broadphase" in spec:
+        game = main.Game(main.broadphases[spec["broadphase"]]())
+    else:
+        game = main.Game()
+    game.setup()
+
+    bullets = spec.get("bullets", 0)
+    if bullets > 0:
+        from vec2 import Vec2
+        rng = random.Random(spec["seed"])
+        sprite = game.sprite_atlas["bullet"]
+        low, high = game.bounds
+        for b in range(bullets):
+            position = Vec2(rng.uniform(low, high - 16), rng.uniform(low, high - 16))
+            speed = Vec2(rng.uniform(-3, 3), rng.uniform(-3, 3))
+            game.spawn_bullet(position, speed, sprite)
+
+    def report():
+        result = {"physics_objects": len(getattr(game, "physics_objects", []))}
+        if hasattr(game, "bullet_pool"):
+            result["bullet_pool"] = game.bullet_pool.stats()
+        return result
+
+    return (lambda i: game.update(i * game.fps)), (lambda i: game.render(0)), report
+
+def load_chapter_05(main, spec):
+    main.balls_to_spawn = spec["balls"]
+    main.blocks_to_spawn = spec["blocks"]
+    main.update_strategy = spec["strategy"]
+    main.use_physics_process = spec.get("physics_process", False)
+    main.setup()
+
+    def report():
+        if main.physics_process == None:
+            return {}
+        # update() does nothing in this mode, the worker's ticks are what happened in the meantime
+        return {"worker_ticks": main.physics_process.ticks, "read_retries": main.physics_process.retries}
+
+    return (lambda i: main.update()), (lambda i: main.render(0.5)), report
+
+def load_chapter_06(main, spec):
+    # the same setup as main() in chapter 06, with its optional loading paths switched on by the spec
+    main.use_dirty_rects = spec["dirty_rects"]
+    main.use_packed_assets = spec["packed_assets"]
+    main.use_streamed_map = spec["streamed_map"]
+    main.use_resource_cache = spec["resource_cache"]
+
+    packed = None
+    if main.use_packed_assets:
+        main.compile_if_stale(main.asset_path, main.packed_file)
+        packed = main.PackedAssets(main.packed_file)
+    manager = main.TileManager(main.asset_path / "index", packed)
+
+    my_map = main.Map("dungeon", (32, 32))
+    if packed != None:
+        my_map.load_packed(packed)
+    else:
+        my_map.load_data("map")
+
+    updates = []
+    report = {}
+    if main.use_resource_cache:
+        # the map acquires its tileset through the cache, and every 10 ticks lets go and takes it again (keys 1 and 3)
+        cache = main.ResourceCache(manager, main.resource_budget, 2)
+        map_tiles = (my_map.tileset, my_map.tiles_used())
+        main.cache_input("3", cache, map_tiles)
+        def cycle_cache(i):
+            if i % 10 == 0:
+                main.cache_input("1", cache, map_tiles)
+                main.cache_input("3", cache, map_tiles)
+        updates.append(cycle_cache)
+        def report():
+            cache_report = cache.report()
+            return {"cache_report": {"resident_bytes": cache_report["resident_bytes"], "evictions": cache_report["evictions"]}}
+    else:
+        for tileset in manager.tile_sets:
+            manager.load_tileset_data(tileset)
+            manager.load_tileset_sprite(tileset, 2)
+        main.do_render = True
+
+    if main.use_streamed_map:
+        chunk_dir = main.asset_path / "map.chunks"
+        if main.chunks_stale(chunk_dir, main.asset_path / "map", main.chunk_tiles):
+            main.write_chunks(my_map.runs(), chunk_dir, main.chunk_tiles)
+        my_map = main.StreamedMap("dungeon", (32, 32), chunk_dir)
+        # pan the camera a tile a tick, out and back, and wait for the chunks so every run streams the same ones
+        def pan_camera(i):
+            step = i % 40
+            main.camera.left = (step if step < 20 else 40 - step) * 32
+            my_map.update(main.camera)
+            my_map.wait()
+        updates.append(pan_camera)
+
+    update = None
+    if len(updates) > 0:
+        def update(i):
+            for function in updates:
+                function(i)
+
+    return update, (lambda i: main.render(manager, my_map)), report
+
+def load_tile_chapter(main, spec):
+    # 07 and 08 have a manager for the tilesets and a map, load everything and turn rendering on
+    if "dirty_rects" in spec:
+        # with dirty rects a render after the first one only redraws what changed (nothing at all in 06), so both
+        # modes get a spec - the False one is the number to compare against older runs
+        main.use_dirty_rects = spec["dirty_rects"]
+    manager_class = getattr(main, "GraphicsManager", None) or getattr(main, "TileManager")
+    manager = manager_class(main.asset_path / "index")
+    for tileset in manager.tile_sets:
+        manager.load_tileset_data(tileset)
+        manager.load_tileset_sprite(tileset, 2)
+    main.do_render = True
+
+    my_map = main.Map("dungeon", (32, 32))
+    my_map.load_data("map")
+
+    if spec["chapter"] == "07":
+        return None, (lambda i: main.render(manager, my_map, i)), {}
+
+    # click every actor now and again so there are damage numbers to update and draw
+    def update(i):
+        if i % 10 == 0:
+            for handler in list(my_map.handlers):
+                if handler.object.animations != None:
+                    my_map.check_click(handler.object.rect.center, i)
+        main.update(my_map, i)
+
+    return update, (lambda i: main.render(manager, my_map, i)), {}
+
+loaders = {
+    "01": load_chapter_01,
+    "02": load_game_chapter,
+    "03": load_game_chapter,
+    "04": load_game_chapter,
+    "05": load_chapter_05,
+    "06": load_chapter_06,
+    "07": load_tile_chapter,
+    "08": load_tile_chapter,
+}
+
+def run_worker(spec):
+    # runs inside the chapter's folder, in its own process
+    chapter_path = worked_path / chapters[spec["chapter"]]
+    os.chdir(chapter_path)
+    sys.path.insert(0, str(chapter_path))
+    random.seed(spec["seed"])
+
+    # chapters print while loading, keep that away from the JSON on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+        update, render, report = loaders[spec["chapter"]](main, spec)
+
+        update_samples = time_calls(update, spec["ticks"]) if update != None else []
+        render_samples = time_calls(render, spec["renders"])
+
+    result = dict(spec)
+    result["update"] = summarise(update_samples)
+    result["render"] = summarise(render_samples)
+    result.update(report() if callable(report) else report)
+    print(json.dumps(result))
+
+def make_specs(args):
+    specs = []
+    base = {"ticks": args.ticks, "renders": args.renders, "seed": args.seed}
+    for chapter in args.chapters:
+        if chapter == "05":
+            for strategy in args.strategies:
+                for balls in args.balls:
+                    for blocks in args.blocks:
+                        specs.append(dict(base, chapter=chapter, strategy=strategy, balls=balls, blocks=blocks, physics_process=False))
+            # the numpy simulation again, but in the worker process
+            for balls in args.balls:
+                for blocks in args.blocks:
+                    specs.append(dict(base, chapter=chapter, strategy="numpy", balls=balls, blocks=blocks, physics_process=True))
+        elif chapter == "04":
+            for name in args.broadphases:
+                for bullets in args.bullets:
+                    specs.append(dict(base, chapter=chapter, broadphase=name, bullets=bullets))
+        elif chapter == "06":
+            # everything off, then one of the optional paths at a time
+            flags = {"packed_assets": False, "streamed_map": False, "resource_cache": False}
+            for dirty_rects in [False, True]:
+                specs.append(dict(base, chapter=chapter, dirty_rects=dirty_rects, **flags))
+            for flag in flags:
+                specs.append(dict(base, chapter=chapter, dirty_rects=False, **dict(flags, **{flag: True})))
+        elif chapter == "08":
+            for dirty_rects in [False, True]:
+                specs.append(dict(base, chapter=chapter, dirty_rects=dirty_rects))
+        else:
+            specs.append(dict(base, chapter=chapter))
+    return specs
+
+def run_spec(spec, verbose = False):
+    env = dict(os.environ)
+    env["SDL_VIDEODRIVER"] = "dummy"
+    env["SDL_AUDIODRIVER"] = "dummy"
+    env["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+    completed = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--worker", json.dumps(spec)],
+        env=env, stdout=subprocess.PIPE, stderr=None if verbose else subprocess.PIPE, text=True
+    )
+    if completed.returncode != 0:
+        return dict(spec, error=(completed.stderr or "").strip().splitlines()[-1:] or ["failed"])
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless timings for the worked chapters")
+    parser.add_argument("--chapters", nargs="+", default=list(chapters.keys()), choices=list(chapters.keys()))
+    parser.add_argument("--ticks", type=int, default=200, help="update ticks to time")
+    parser.add_argument("--renders", type=int, default=100, help="render calls to time")
+    parser.add_argument("--balls", type=int, nargs="+", default=[10, 200], help="balls_to_spawn for chapter 05")
+    parser.add_argument("--blocks", type=int, nargs="+", default=[20], help="blocks_to_spawn for chapter 05")
+    parser.add_argument("--strategies", nargs="+", default=None, help="chapter 05 update strategies, default is all of them")
+    parser.add_argument("--bullets", type=int, nargs="+", default=[0, 500], help="extra bullets for chapter 04")
+    parser.add_argument("--broadphases", nargs="+", default=broadphases, choices=broadphases, help="chapter 04 broadphases")
+    parser.add_argument("--seed", type=int, default=102)
+    parser.add_argument("--output", help="also write the JSON here")
+    parser.add_argument("--verbose", action="store_true", help="show chapter output")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker != None:
+        run_worker(json.loads(args.worker))
+        return
+
+    if args.strategies == None:
+        args.strategies = ["naive", "old_skool", "linear_partition", "quadtree", "combined", "numpy", "sweep_and_prune"]
+
+    results = [run_spec(spec, args.verbose) for spec in make_specs(args)]
+    report = json.dumps({"python": sys.version.split()[0], "results": results}, indent=2)
+    print(report)
+    if args.output != None:
+        with open(args.output, "w") as f:
+            f.write(report)
+
+    if any("error" in result for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()